@@ -10,6 +10,13 @@ logger = setup_logger(__name__)
 # Initialize Firebase Admin SDK
 _firebase_initialized = False
 
+def _normalize_emails(emails) -> frozenset:
+    """Lowercase and strip whitelist entries so matching ignores case and padding"""
+    return frozenset(e.lower().strip() for e in emails)
+
+# Normalized once; ALLOWED_EMAILS is a hardcoded class variable
+_allowed_emails = _normalize_emails(settings.ALLOWED_EMAILS)
+
 def init_firebase():
     global _firebase_initialized
     if not _firebase_initialized:
@@ -47,8 +54,7 @@ def verify_firebase_token(authorization: Optional[str] = None) -> dict:
         user_id = decoded_token.get("uid")
         
         # Check whitelist
-        allowed = [e.lower().strip() for e in settings.ALLOWED_EMAILS]
-        if user_email not in allowed:
+        if user_email not in _allowed_emails:
             logger.warning(f"Access denied for non-whitelisted user: {user_email}")
             raise HTTPException(
                 status_code=403, 
@@ -23,3 +23,4 @@ def get_firestore_client():
 # Collection names
 WORKFLOWS_COLLECTION = "workflows"
 ASSETS_COLLECTION = "assets"
+UPLOADS_COLLECTION = "uploads"
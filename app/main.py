@@ -1,11 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.routers import generation, library, health, workflow
 from app.logging_config import setup_logger
 
 logger = setup_logger(__name__)
 
-app = FastAPI(title="GenMedia API")
+app = FastAPI(title="GenMedia API", default_response_class=ORJSONResponse)
 
 logger.info("Starting GenMedia API application")
 
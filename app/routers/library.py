@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import Optional
-from app.schemas import SaveAssetRequest, AssetResponse, LibraryResponse
+from app.schemas import SaveAssetRequest, AssetResponse, LibraryResponse, UploadUrlRequest, UploadUrlResponse
 from app.auth import get_current_user
-from app.services.library_firestore import LibraryServiceFirestore
+from app.services.library_firestore import LibraryServiceFirestore, UploadNotFoundError
 from app.logging_config import setup_logger
 
 logger = setup_logger(__name__)
@@ -34,21 +34,71 @@ async def save_asset(
         logger.error(f"Asset save failed for user {user['email']}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/upload-url", response_model=UploadUrlResponse)
+async def create_upload_url(
+    request: UploadUrlRequest,
+    user: dict = Depends(get_current_user),
+    service: LibraryServiceFirestore = Depends(get_library_service)
+):
+    """Get a signed URL to PUT a file directly to storage"""
+    try:
+        logger.info(f"Upload URL request from user {user['email']}: {request.asset_type}")
+        return await service.create_upload_url(
+            user_id=user["uid"],
+            asset_type=request.asset_type,
+            mime_type=request.mime_type,
+            prompt=request.prompt
+        )
+    except ValueError as e:
+        logger.warning(f"Invalid upload URL request from {user['email']}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Upload URL creation failed for user {user['email']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{asset_id}/finalize", response_model=AssetResponse)
+async def finalize_upload(
+    asset_id: str,
+    user: dict = Depends(get_current_user),
+    service: LibraryServiceFirestore = Depends(get_library_service)
+):
+    """Add a directly uploaded file to the library"""
+    try:
+        logger.info(f"Finalize upload request from user {user['email']}: {asset_id}")
+        return await service.finalize_upload(asset_id=asset_id, user_id=user["uid"])
+    except UploadNotFoundError as e:
+        logger.warning(f"Upload not found for user {user['email']}: {asset_id}")
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Cannot finalize upload {asset_id} for user {user['email']}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except PermissionError as e:
+        logger.warning(f"Permission denied for user {user['email']} finalizing upload {asset_id}")
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        logger.error(f"Finalize upload failed for user {user['email']}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("", response_model=LibraryResponse)
 async def list_assets(
     asset_type: Optional[str] = None,
     limit: int = 50,
     user: dict = Depends(get_current_user),
-    service: LibraryServiceFirestore = Depends(get_library_service)
+    service: LibraryServiceFirestore = Depends(get_library_service),
+    page_token: Optional[str] = None
 ):
-    """List assets for the authenticated user"""
+    """List assets for the authenticated user, one page at a time"""
     try:
         logger.info(f"List assets request from user {user['email']} (type={asset_type}, limit={limit})")
         return await service.list_assets(
             user_id=user["uid"],
             asset_type=asset_type,
-            limit=limit
+            limit=limit,
+            page_token=page_token
         )
+    except ValueError as e:
+        logger.warning(f"Invalid list assets request from {user['email']}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"List assets failed for user {user['email']}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -40,6 +40,11 @@ class SaveAssetRequest(BaseModel):
     prompt: Optional[str] = None
     mime_type: Optional[str] = None
 
+class UploadUrlRequest(BaseModel):
+    asset_type: str
+    prompt: Optional[str] = None
+    mime_type: Optional[str] = None
+
 # ============== RESPONSE MODELS ==============
 
 class ImageResponse(BaseModel):
@@ -72,6 +77,12 @@ class VideoStatusResponse(BaseModel):
 class LibraryResponse(BaseModel):
     assets: List[AssetResponse]
     count: int
+    next_page_token: Optional[str] = None
+
+class UploadUrlResponse(BaseModel):
+    asset_id: str
+    upload_url: str
+    mime_type: str
 
 # ============== WORKFLOW MODELS ==============
 
@@ -32,11 +32,92 @@ image_client = genai.Client(
 )
 
 
+def build_image_payload(
+    prompt: str,
+    reference_images: Optional[List[str]] = None,
+    aspect_ratio: str = "1:1",
+    resolution: str = "1K"
+) -> dict:
+    """Build the generate_content arguments for an image request"""
+    contents = []
+    
+    # Add reference images if provided - use as visual ingredients
+    if reference_images:
+        logger.info(f"Processing {len(reference_images)} reference images as ingredients")
+        valid_images = []
+        
+        for i, ref_image in enumerate(reference_images):
+            try:
+                clean_image = GenerationService._strip_base64_prefix(ref_image)
+                image_bytes = base64.b64decode(clean_image)
+                
+                # Validate image size (Gemini requires reasonable sized images)
+                if len(image_bytes) < 100:
+                    logger.warning(f"Reference image {i+1} too small ({len(image_bytes)} bytes), skipping")
+                    continue
+                
+                # Check for valid PNG/JPEG header
+                is_png = image_bytes[:8] == b'\x89PNG\r\n\x1a\n'
+                is_jpeg = image_bytes[:2] == b'\xff\xd8'
+                
+                if not (is_png or is_jpeg):
+                    logger.warning(f"Reference image {i+1} has invalid format (not PNG/JPEG), skipping")
+                    continue
+                
+                mime_type = "image/png" if is_png else "image/jpeg"
+                contents.append(types.Part.from_bytes(data=image_bytes, mime_type=mime_type))
+                valid_images.append(i+1)
+                logger.info(f"Added reference image {i+1}: {len(image_bytes)} bytes, format: {mime_type}")
+                
+            except Exception as e:
+                logger.error(f"Failed to process reference image {i+1}: {e}")
+                continue
+        
+        if valid_images:
+            # Enhanced prompt that treats reference images as ingredients/components
+            ingredient_prompt = (
+                f"IMPORTANT: Use the provided reference image(s) as visual ingredients and components. "
+                f"Extract and incorporate their key visual elements (subjects, objects, colors, textures, style) "
+                f"into the generated image.\n\n"
+                f"Generation request: {prompt}\n\n"
+                f"Create a new image that incorporates visual elements from the reference image(s) "
+                f"while following the generation request above."
+            )
+            contents.append(ingredient_prompt)
+            logger.info(f"Using {len(valid_images)} valid reference images: {valid_images}")
+        else:
+            logger.warning("No valid reference images found, generating without references")
+            contents = [prompt]
+    else:
+        contents.append(prompt)
+    
+    # Build config with appropriate settings
+    config = types.GenerateContentConfig(
+        response_modalities=["IMAGE", "TEXT"],
+        image_config=types.ImageConfig(
+            aspect_ratio=aspect_ratio,
+            image_size=resolution
+        )
+    )
+    
+    return {
+        "model": settings.gemini_image_model,
+        "contents": contents,
+        "config": config
+    }
+
+
 class GenerationService:
-    def __init__(self, library_service: Optional[LibraryServiceFirestore] = None):
+    def __init__(
+        self,
+        library_service: Optional[LibraryServiceFirestore] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
         self.library = library_service or LibraryServiceFirestore()
+        self.transport = transport  # Optional httpx transport override (e.g. httpx.MockTransport in tests)
     
-    def _strip_base64_prefix(self, data: str) -> str:
+    @staticmethod
+    def _strip_base64_prefix(data: str) -> str:
         """Remove data URL prefix if present and ensure valid base64 padding"""
         if not data:
             return data
@@ -95,89 +176,10 @@ class GenerationService:
     ) -> ImageResponse:
         """Generate images using Gemini with retry on rate limits"""
         
-<<<<<<< HEAD
-        if reference_images:
-            for ref_image in reference_images:
-                clean_image = self._strip_base64_prefix(ref_image)
-                image_bytes = base64.b64decode(clean_image)
-                contents.append(types.Part.from_bytes(data=image_bytes, mime_type="image/png"))
+        payload = build_image_payload(prompt, reference_images, aspect_ratio, resolution)
         
-        contents.append(prompt)
-        
-        response = image_client.models.generate_content(
-            model=settings.gemini_image_model,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                response_modalities=["TEXT", "IMAGE"],
-                image_config=types.ImageConfig(
-                    aspect_ratio=aspect_ratio,
-                    image_size=resolution
-                )
-=======
         async def _do_generate():
-            contents = []
-            
-            # Add reference images if provided - use as visual ingredients
-            if reference_images:
-                logger.info(f"Processing {len(reference_images)} reference images as ingredients")
-                valid_images = []
-                
-                for i, ref_image in enumerate(reference_images):
-                    try:
-                        clean_image = self._strip_base64_prefix(ref_image)
-                        image_bytes = base64.b64decode(clean_image)
-                        
-                        # Validate image size (Gemini requires reasonable sized images)
-                        if len(image_bytes) < 100:
-                            logger.warning(f"Reference image {i+1} too small ({len(image_bytes)} bytes), skipping")
-                            continue
-                        
-                        # Check for valid PNG/JPEG header
-                        is_png = image_bytes[:8] == b'\x89PNG\r\n\x1a\n'
-                        is_jpeg = image_bytes[:2] == b'\xff\xd8'
-                        
-                        if not (is_png or is_jpeg):
-                            logger.warning(f"Reference image {i+1} has invalid format (not PNG/JPEG), skipping")
-                            continue
-                        
-                        mime_type = "image/png" if is_png else "image/jpeg"
-                        contents.append(types.Part.from_bytes(data=image_bytes, mime_type=mime_type))
-                        valid_images.append(i+1)
-                        logger.info(f"Added reference image {i+1}: {len(image_bytes)} bytes, format: {mime_type}")
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to process reference image {i+1}: {e}")
-                        continue
-                
-                if valid_images:
-                    # Enhanced prompt that treats reference images as ingredients/components
-                    ingredient_prompt = (
-                        f"IMPORTANT: Use the provided reference image(s) as visual ingredients and components. "
-                        f"Extract and incorporate their key visual elements (subjects, objects, colors, textures, style) "
-                        f"into the generated image.\n\n"
-                        f"Generation request: {prompt}\n\n"
-                        f"Create a new image that incorporates visual elements from the reference image(s) "
-                        f"while following the generation request above."
-                    )
-                    contents.append(ingredient_prompt)
-                    logger.info(f"Using {len(valid_images)} valid reference images: {valid_images}")
-                else:
-                    logger.warning("No valid reference images found, generating without references")
-                    contents = [prompt]
-            else:
-                contents.append(prompt)
-            
-            # Build config with appropriate settings
-            config = types.GenerateContentConfig(
-                response_modalities=["IMAGE", "TEXT"]
->>>>>>> firestore-migration
-            )
-            
-            response = image_client.models.generate_content(
-                model=settings.gemini_image_model,
-                contents=contents,
-                config=config
-            )
+            response = image_client.models.generate_content(**payload)
             
             images = []
             for part in response.candidates[0].content.parts:
@@ -270,17 +272,10 @@ class GenerationService:
             payload["parameters"]["seed"] = seed
             logger.info(f"Using seed {seed} for consistent generation")
         
-<<<<<<< HEAD
-        if response.status_code == 429:
-            raise Exception(f"API error: 429 - Rate limit exceeded. You may have too many concurrent video generations or have reached your daily quota. Please wait a few minutes and try again.")
-        
-        if response.status_code != 200:
-            raise Exception(f"API error: {response.status_code} - {response.text}")
-=======
         logger.info(f"Veo API request: endpoint={endpoint}, instance_keys={list(instance.keys())}")
         
         async def _do_video_request():
-            async with httpx.AsyncClient() as http_client:
+            async with httpx.AsyncClient(transport=self.transport) as http_client:
                 response = await http_client.post(endpoint, json=payload, headers=self._get_auth_headers(), timeout=300.0)
             
             if response.status_code == 429:
@@ -294,7 +289,6 @@ class GenerationService:
             return response.json()
         
         result = await self._retry_with_backoff(_do_video_request, "Video generation")
->>>>>>> firestore-migration
         
         return {
             "status": "processing",
@@ -316,7 +310,7 @@ class GenerationService:
         }
         
         async def _do_status_check():
-            async with httpx.AsyncClient() as http_client:
+            async with httpx.AsyncClient(transport=self.transport) as http_client:
                 response = await http_client.post(
                     endpoint, 
                     json=payload, 
@@ -442,7 +436,7 @@ class GenerationService:
             }
         }
         
-        async with httpx.AsyncClient() as http_client:
+        async with httpx.AsyncClient(transport=self.transport) as http_client:
             response = await http_client.post(endpoint, json=payload, headers=self._get_auth_headers(), timeout=300.0)
         
         if response.status_code != 200:
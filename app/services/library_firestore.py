@@ -2,17 +2,37 @@
 Library service using Firestore for metadata and GCS for file storage
 """
 import uuid
-import base64
-from datetime import datetime
+import asyncio
+import binascii
+from datetime import datetime, timedelta
 from typing import Optional
+import google.auth
+import google.auth.transport.requests
+from google.api_core.exceptions import NotFound
+from google.auth import credentials as auth_credentials
 from google.cloud import storage
-from app.firestore import get_firestore_client, ASSETS_COLLECTION
+from app.firestore import get_firestore_client, ASSETS_COLLECTION, UPLOADS_COLLECTION
 from app.config import settings
 from app.schemas import AssetResponse, LibraryResponse
 from app.logging_config import setup_logger
 
 logger = setup_logger(__name__)
 
+# Fields needed to build an AssetResponse; list queries project to these
+ASSET_RESPONSE_FIELDS = ["id", "user_id", "asset_type", "blob_path", "mime_type", "created_at", "prompt"]
+
+# Data URL headers ("data:video/mp4;base64,") are short; don't scan the payload for the comma
+DATA_URL_HEADER_MAX_LENGTH = 256
+
+# Signed upload URLs let clients PUT bytes straight to GCS
+UPLOAD_URL_EXPIRATION = timedelta(minutes=15)
+# Pending uploads outlive their URL so a PUT that started in time can still finalize
+UPLOAD_FINALIZE_GRACE = timedelta(hours=1)
+
+
+class UploadNotFoundError(Exception):
+    """No pending upload exists for the given asset ID"""
+
 
 class LibraryServiceFirestore:
     """
@@ -29,26 +49,79 @@ class LibraryServiceFirestore:
         - prompt: string (optional)
         - source: "upload" | "generated"
         - workflow_id: string (optional - which workflow created it)
+    
+    /uploads/{asset_id}
+        - same fields as /assets, held until the client finishes a direct upload
+        - expires_at: datetime (URL expiry plus finalize grace; Firestore TTL field)
     """
     
-    def __init__(self, gcs_client: Optional[storage.Client] = None):
+    def __init__(
+        self,
+        gcs_client: Optional[storage.Client] = None,
+        credentials: Optional[auth_credentials.Credentials] = None
+    ):
         self.db = get_firestore_client()
         self.assets_ref = self.db.collection(ASSETS_COLLECTION)
+        self.uploads_ref = self.db.collection(UPLOADS_COLLECTION)
         self.storage_client = gcs_client or storage.Client()
         self.bucket = self.storage_client.bucket(settings.gcs_bucket)
+        # Used to sign upload URLs; resolved from ADC on first use when not given
+        self.credentials = credentials
     
     def _generate_asset_id(self) -> str:
         return str(uuid.uuid4())
     
-    def _strip_base64_prefix(self, data: str) -> str:
-        """Remove data URL prefix if present"""
-        if data and ',' in data and data.startswith('data:'):
-            return data.split(',', 1)[1]
-        return data
+    def _decode_base64(self, data: str) -> bytes:
+        """Decode base64 data, skipping any data URL header without slicing a second copy"""
+        encoded = data.encode("ascii")
+        start = 0
+        if encoded.startswith(b"data:"):
+            comma = encoded.find(b",", 0, DATA_URL_HEADER_MAX_LENGTH)
+            if comma == -1:
+                raise ValueError("Malformed data URL: no ',' after the header")
+            start = comma + 1
+        return binascii.a2b_base64(memoryview(encoded)[start:])
+    
+    def _sign_upload_url(self, blob: storage.Blob, mime_type: str) -> str:
+        """Sign a PUT URL, via the IAM signBlob API when the credentials hold no private key"""
+        if self.credentials is None:
+            self.credentials, _ = google.auth.default()
+        credentials = self.credentials
+        signer = {}
+        if not isinstance(credentials, auth_credentials.Signing):
+            # User ADC from `gcloud auth application-default login` has no account to sign as
+            if not hasattr(credentials, "service_account_email"):
+                raise RuntimeError(
+                    "Signing upload URLs requires service account credentials; "
+                    "user credentials cannot sign (set GOOGLE_APPLICATION_CREDENTIALS to a key file)"
+                )
+            # Cloud Run / GCE credentials are token-only; refresh to learn the account email
+            if not credentials.valid:
+                credentials.refresh(google.auth.transport.requests.Request())
+            signer = {
+                "service_account_email": credentials.service_account_email,
+                "access_token": credentials.token
+            }
+        return blob.generate_signed_url(
+            version="v4",
+            method="PUT",
+            expiration=UPLOAD_URL_EXPIRATION,
+            content_type=mime_type,
+            **signer
+        )
     
     def _get_url(self, blob_path: str) -> str:
         """Generate public URL for a blob"""
         return f"https://storage.googleapis.com/{settings.gcs_bucket}/{blob_path}"
+    
+    def _file_type(self, asset_type: str, mime_type: Optional[str]) -> tuple[str, str]:
+        """Return (file extension, mime type) for an asset, validating asset_type"""
+        if asset_type == "image":
+            ext = "png" if not mime_type or "png" in mime_type else "jpg"
+            return ext, mime_type or "image/png"
+        if asset_type == "video":
+            return "mp4", mime_type or "video/mp4"
+        raise ValueError("asset_type must be 'image' or 'video'")
 
     async def save_asset(
         self,
@@ -61,32 +134,22 @@ class LibraryServiceFirestore:
         workflow_id: Optional[str] = None
     ) -> AssetResponse:
         """Save an image or video to the asset library"""
+        # Reject bad requests before touching the (possibly large) payload
+        if not user_id:
+            raise ValueError("user_id is required")
+        ext, mime_type = self._file_type(asset_type, mime_type)
+        
         asset_id = self._generate_asset_id()
         now = datetime.utcnow()
         
         logger.info(f"Saving {asset_type} asset for user {user_id}")
         
-        # Determine file extension and mime type
-        if asset_type == "image":
-            ext = "png" if not mime_type or "png" in mime_type else "jpg"
-            mime_type = mime_type or "image/png"
-        elif asset_type == "video":
-            ext = "mp4"
-            mime_type = mime_type or "video/mp4"
-        else:
-            raise ValueError("asset_type must be 'image' or 'video'")
-        
         # Create blob path
         blob_path = f"users/{user_id}/{asset_type}s/{asset_id}.{ext}"
         
-        # Decode and upload to GCS
-        clean_data = self._strip_base64_prefix(data)
-        file_bytes = base64.b64decode(clean_data)
-        
-        blob = self.bucket.blob(blob_path)
-        blob.upload_from_string(file_bytes, content_type=mime_type)
+        # Decode file data
+        file_bytes = self._decode_base64(data)
         
-        # Save metadata to Firestore
         asset_data = {
             "id": asset_id,
             "user_id": user_id,
@@ -99,7 +162,19 @@ class LibraryServiceFirestore:
             "workflow_id": workflow_id
         }
         
-        self.assets_ref.document(asset_id).set(asset_data)
+        # Upload to GCS, then save metadata, both off the event loop; writing the doc
+        # last keeps listings from showing an asset whose file isn't stored yet
+        blob = self.bucket.blob(blob_path)
+        await asyncio.to_thread(blob.upload_from_string, file_bytes, content_type=mime_type)
+        try:
+            await asyncio.to_thread(self.assets_ref.document(asset_id).set, asset_data)
+        except Exception:
+            # Don't orphan a stored file that no metadata points at
+            try:
+                await asyncio.to_thread(blob.delete)
+            except Exception as e:
+                logger.warning(f"Failed to remove uploaded file for asset {asset_id}: {e}")
+            raise
         
         logger.info(f"Successfully saved {asset_type} asset {asset_id} to {blob_path}")
         
@@ -115,13 +190,89 @@ class LibraryServiceFirestore:
             user_id=user_id
         )
 
+    async def create_upload_url(
+        self,
+        user_id: str,
+        asset_type: str,
+        mime_type: Optional[str] = None,
+        prompt: Optional[str] = None
+    ) -> dict:
+        """Reserve an asset and return a signed URL the client can PUT the raw file to"""
+        if not user_id:
+            raise ValueError("user_id is required")
+        ext, mime_type = self._file_type(asset_type, mime_type)
+        asset_id = self._generate_asset_id()
+        now = datetime.utcnow()
+        blob_path = f"users/{user_id}/{asset_type}s/{asset_id}.{ext}"
+        
+        # Token refresh and IAM signing are network calls; keep them off the event loop
+        upload_url = await asyncio.to_thread(self._sign_upload_url, self.bucket.blob(blob_path), mime_type)
+        
+        # Held outside /assets so listings never show a file that isn't there yet
+        self.uploads_ref.document(asset_id).set({
+            "id": asset_id,
+            "user_id": user_id,
+            "asset_type": asset_type,
+            "blob_path": blob_path,
+            "mime_type": mime_type,
+            "created_at": now,
+            "prompt": prompt,
+            "source": "upload",
+            "workflow_id": None,
+            "expires_at": now + UPLOAD_URL_EXPIRATION + UPLOAD_FINALIZE_GRACE
+        })
+        
+        logger.info(f"Issued upload URL for {asset_type} asset {asset_id} to user {user_id}")
+        
+        return {"asset_id": asset_id, "upload_url": upload_url, "mime_type": mime_type}
+
+    async def finalize_upload(self, asset_id: str, user_id: str) -> AssetResponse:
+        """Publish a directly uploaded asset to the library once its file is in GCS"""
+        upload_ref = self.uploads_ref.document(asset_id)
+        doc = upload_ref.get()
+        
+        if not doc.exists:
+            raise UploadNotFoundError("Upload not found")
+        
+        data = doc.to_dict()
+        
+        # Check ownership
+        if data.get("user_id") != user_id:
+            raise PermissionError("Access denied")
+        
+        # The signed URL only bounds when the PUT may start, so a stored file always finalizes
+        if not await asyncio.to_thread(self.bucket.blob(data["blob_path"]).exists):
+            # Firestore hands back UTC-aware datetimes; expires_at is written naive UTC
+            if data["expires_at"].replace(tzinfo=None) <= datetime.utcnow():
+                raise ValueError("Upload expired")
+            raise ValueError("Upload has not completed")
+        
+        data.pop("expires_at")
+        self.assets_ref.document(asset_id).set(data)
+        upload_ref.delete()
+        
+        logger.info(f"Finalized upload of {data['asset_type']} asset {asset_id} for user {user_id}")
+        
+        created_at = data["created_at"]
+        
+        return AssetResponse(
+            id=asset_id,
+            url=self._get_url(data["blob_path"]),
+            asset_type=data["asset_type"],
+            prompt=data.get("prompt"),
+            created_at=created_at.isoformat() + "Z" if hasattr(created_at, 'isoformat') else created_at,
+            mime_type=data["mime_type"],
+            user_id=user_id
+        )
+
     async def list_assets(
         self,
         user_id: str,
         asset_type: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        page_token: Optional[str] = None
     ) -> LibraryResponse:
-        """List assets for a user"""
+        """List a page of assets for a user; page_token is the last asset ID of the previous page"""
         from google.cloud.firestore_v1.base_query import FieldFilter
         
         # Query by user_id
@@ -131,8 +282,18 @@ class LibraryServiceFirestore:
         if asset_type:
             query = query.where(filter=FieldFilter("asset_type", "==", asset_type))
         
-        # Order by created_at descending and limit
-        query = query.order_by("created_at", direction="DESCENDING").limit(limit)
+        # Order by created_at descending
+        query = query.order_by("created_at", direction="DESCENDING")
+        
+        # Resume after the previous page's last asset
+        if page_token:
+            cursor = self.assets_ref.document(page_token).get()
+            if not cursor.exists or cursor.to_dict().get("user_id") != user_id:
+                raise ValueError("Invalid page token")
+            query = query.start_after(cursor)
+        
+        # Limit the page, fetching only response fields
+        query = query.limit(limit).select(ASSET_RESPONSE_FIELDS)
         
         docs = query.stream()
         
@@ -152,7 +313,10 @@ class LibraryServiceFirestore:
                 user_id=data["user_id"]
             ))
         
-        return LibraryResponse(assets=assets, count=len(assets))
+        # A full page may have more after it
+        next_page_token = assets[-1].id if assets and len(assets) == limit else None
+        
+        return LibraryResponse(assets=assets, count=len(assets), next_page_token=next_page_token)
 
     async def get_asset(self, asset_id: str, user_id: str) -> AssetResponse:
         """Get a specific asset by ID"""
@@ -206,24 +370,29 @@ class LibraryServiceFirestore:
         Batch resolve multiple asset IDs to URLs.
         Returns dict mapping asset_id to {url, exists, asset_type, mime_type}
         """
-        result = {}
+        result = {asset_id: {"url": None, "exists": False} for asset_id in asset_ids}
+        if not result:
+            return result
         
-        for asset_id in asset_ids:
+        # One batched read instead of a get() round trip per asset
+        refs = []
+        for asset_id in result:
             try:
-                doc = self.assets_ref.document(asset_id).get()
+                refs.append(self.assets_ref.document(asset_id))
+            except ValueError as e:
+                logger.warning(f"Invalid asset id {asset_id!r}: {e}")
+        try:
+            for doc in self.db.get_all(refs):
                 if doc.exists:
                     data = doc.to_dict()
-                    result[asset_id] = {
+                    result[doc.id] = {
                         "url": self._get_url(data["blob_path"]),
                         "exists": True,
                         "asset_type": data["asset_type"],
                         "mime_type": data["mime_type"]
                     }
-                else:
-                    result[asset_id] = {"url": None, "exists": False}
-            except Exception as e:
-                logger.warning(f"Failed to resolve asset {asset_id}: {e}")
-                result[asset_id] = {"url": None, "exists": False}
+        except Exception as e:
+            logger.warning(f"Failed to resolve assets {asset_ids}: {e}")
         
         return result
 
@@ -241,11 +410,11 @@ class LibraryServiceFirestore:
         if data.get("user_id") != user_id:
             raise PermissionError("Access denied. You can only delete your own assets.")
         
-        # Delete asset file from GCS
+        # Delete asset file from GCS; a single DELETE, no exists() check first
         try:
-            blob = self.bucket.blob(data["blob_path"])
-            if blob.exists():
-                blob.delete()
+            self.bucket.blob(data["blob_path"]).delete()
+        except NotFound:
+            logger.debug(f"Blob {data['blob_path']} already gone")
         except Exception as e:
             logger.warning(f"Failed to delete blob {data['blob_path']}: {e}")
         
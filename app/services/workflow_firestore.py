@@ -67,24 +67,27 @@ class WorkflowServiceFirestore:
         if not asset_refs:
             return nodes
         
-        # Batch fetch assets
-        asset_map = {}
+        # Batch fetch assets in one read instead of a get() round trip per ref
+        refs = []
         for ref in asset_refs:
             try:
-                doc = self.assets_ref.document(ref).get()
+                refs.append(self.assets_ref.document(ref))
+            except ValueError as e:
+                logger.warning(f"Invalid asset ref {ref!r}: {e}")
+        
+        asset_map = {}
+        try:
+            for doc in self.db.get_all(refs):
                 if doc.exists:
                     asset_data = doc.to_dict()
-                    asset_map[ref] = {
+                    asset_map[doc.id] = {
                         "url": f"https://storage.googleapis.com/{settings.gcs_bucket}/{asset_data.get('blob_path', '')}",
                         "exists": True,
                         "mime_type": asset_data.get("mime_type"),
                         "asset_type": asset_data.get("asset_type")
                     }
-                else:
-                    asset_map[ref] = {"url": None, "exists": False}
-            except Exception as e:
-                logger.warning(f"Failed to resolve asset {ref}: {e}")
-                asset_map[ref] = {"url": None, "exists": False}
+        except Exception as e:
+            logger.warning(f"Failed to resolve assets {asset_refs}: {e}")
         
         # Inject resolved URLs into nodes
         resolved_nodes = []
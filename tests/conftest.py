@@ -0,0 +1,116 @@
+"""
+Shared pytest configuration for all test suites
+"""
+import os
+import sys
+import types
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+
+class _StubDocumentSnapshot:
+    """Stand-in for google.cloud.firestore.DocumentSnapshot"""
+    exists = False
+    
+    def to_dict(self):
+        return None
+
+
+class _StubDocumentReference:
+    """Stand-in for google.cloud.firestore.DocumentReference"""
+    
+    def get(self):
+        return _StubDocumentSnapshot()
+    
+    def set(self, document_data, merge=False):
+        pass
+    
+    def update(self, field_updates):
+        pass
+    
+    def delete(self):
+        pass
+
+
+class _StubFieldFilter:
+    """Stand-in for google.cloud.firestore_v1.base_query.FieldFilter"""
+    
+    def __init__(self, field_path, op_string, value=None):
+        self.field_path = field_path
+        self.op_string = op_string
+        self.value = value
+
+
+class _StubClient:
+    """Stand-in for google.cloud.firestore.Client"""
+    
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("Firestore is stubbed out; patch get_firestore_client instead")
+
+
+def _stub_firestore():
+    """Register lightweight google.cloud.firestore modules so gRPC is never imported"""
+    firestore = types.ModuleType("google.cloud.firestore")
+    firestore.Client = _StubClient
+    firestore.DocumentReference = _StubDocumentReference
+    firestore.DocumentSnapshot = _StubDocumentSnapshot
+    firestore.SERVER_TIMESTAMP = object()
+    
+    firestore_v1 = types.ModuleType("google.cloud.firestore_v1")
+    base_query = types.ModuleType("google.cloud.firestore_v1.base_query")
+    base_query.FieldFilter = _StubFieldFilter
+    base_client = types.ModuleType("google.cloud.firestore_v1.base_client")
+    base_client.DEFAULT_DATABASE = "(default)"
+    firestore_v1.base_query = base_query
+    firestore_v1.base_client = base_client
+    
+    for module in (firestore, firestore_v1, base_query, base_client):
+        sys.modules.setdefault(module.__name__, module)
+
+
+class _StubFirebaseError(Exception):
+    """Stand-in for firebase_admin.exceptions.FirebaseError"""
+
+
+def _stub_verify_id_token(id_token, *args, **kwargs):
+    raise _StubFirebaseError("Firebase is stubbed out; patch verify_id_token instead")
+
+
+def _stub_firestore_client(*args, **kwargs):
+    raise RuntimeError("Firebase is stubbed out; patch get_firestore_client instead")
+
+
+def _stub_firebase():
+    """Register lightweight firebase_admin modules so the SDK is never imported"""
+    firebase_admin = types.ModuleType("firebase_admin")
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    
+    auth = types.ModuleType("firebase_admin.auth")
+    auth.verify_id_token = _stub_verify_id_token
+    exceptions = types.ModuleType("firebase_admin.exceptions")
+    exceptions.FirebaseError = _StubFirebaseError
+    firestore = types.ModuleType("firebase_admin.firestore")
+    firestore.client = _stub_firestore_client
+    firebase_admin.auth = auth
+    firebase_admin.exceptions = exceptions
+    firebase_admin.firestore = firestore
+    
+    for module in (firebase_admin, auth, exceptions, firestore):
+        sys.modules.setdefault(module.__name__, module)
+
+
+if os.getenv("PYTEST_STUB_FIRESTORE") == "1":
+    _stub_firestore()
+
+if os.getenv("PYTEST_STUB_FIREBASE") == "1":
+    _stub_firebase()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _mock_google_auth():
+    """Serve fake credentials to every google.auth.default() call"""
+    creds = SimpleNamespace(token="fake-token", refresh=lambda request: None)
+    with patch("app.services.generation.google.auth.default", return_value=(creds, "project")) as m:
+        yield m
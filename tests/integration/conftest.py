@@ -1,17 +1,22 @@
 import pytest
-from unittest.mock import MagicMock, AsyncMock, patch
+import httpx
+from unittest.mock import MagicMock, patch
 from fastapi.testclient import TestClient
 from app.main import app
 from app.auth import get_current_user
 from app.routers.generation import get_generation_service
-from app.routers.library import get_library_service
-from app.routers.workflow import get_workflow_service
-from app.routers.workflow import get_workflow_service
+from app.services.generation import GenerationService
 
-@pytest.fixture
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+@pytest.fixture(scope="session")
 def client():
-    """Test client for the app"""
-    return TestClient(app)
+    """Test client for the app, shared across the session"""
+    with TestClient(app, backend="asyncio", backend_options={"use_uvloop": uvloop is not None}) as c:
+        yield c
 
 @pytest.fixture
 def authenticated_user():
@@ -25,7 +30,7 @@ def mock_auth(authenticated_user):
     yield authenticated_user
     app.dependency_overrides.pop(get_current_user, None)
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_gcs_bucket():
     """Mock GCS bucket"""
     bucket = MagicMock()
@@ -48,14 +53,31 @@ def mock_firestore_client():
         mock_lib_fs.return_value = mock_client
         yield mock_client
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_gcs_client(mock_gcs_bucket):
     """Mock GCS client"""
     client = MagicMock()
     client.bucket.return_value = mock_gcs_bucket
     return client
 
+@pytest.fixture(autouse=True)
+def _reset_gcs_mocks(mock_gcs_bucket, mock_gcs_client):
+    """Clear recorded calls on the shared GCS mocks after each test"""
+    yield
+    mock_gcs_bucket.reset_mock()
+    mock_gcs_client.reset_mock()
+
 @pytest.fixture
+def vertex_transport():
+    """Serve generation service HTTP calls from a canned Vertex AI response"""
+    def _install(json_body, status_code=200):
+        transport = httpx.MockTransport(lambda request: httpx.Response(status_code, json=json_body))
+        app.dependency_overrides[get_generation_service] = lambda: GenerationService(transport=transport)
+        return transport
+    yield _install
+    app.dependency_overrides.pop(get_generation_service, None)
+
+@pytest.fixture(scope="session")
 def mock_vertex_response_image():
     """Mock successful Vertex AI image response"""
     return {
@@ -66,7 +88,7 @@ def mock_vertex_response_image():
         }]
     }
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_vertex_response_text():
     """Mock successful Vertex AI text response"""
     return {
@@ -77,12 +99,12 @@ def mock_vertex_response_text():
         }]
     }
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_vertex_response_video_started():
     """Mock video generation started"""
     return {"name": "projects/test/locations/us-central1/operations/op-123"}
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_vertex_response_video_complete():
     """Mock video generation complete"""
     return {
@@ -96,7 +118,7 @@ def mock_vertex_response_video_complete():
         }
     }
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_vertex_response_upscale():
     """Mock upscale response"""
     return {
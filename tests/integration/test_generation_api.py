@@ -1,6 +1,24 @@
 import pytest
 import base64
-from unittest.mock import patch, MagicMock, AsyncMock
+from unittest.mock import patch, MagicMock
+
+pytestmark = pytest.mark.local
+
+# 8x8 RGB PNG, above build_image_payload's 100-byte minimum so it isn't skipped
+_REF_IMAGE_B64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAgAAAAICAIAAABLbSncAAAAuElEQVR42mNgkLeLrZm96+YPcbPQksmbLn7g1/PN6V51kkHQwD+vd83pV5wa"
+    "7mmtSw4/YlSwj6uds/sWg5JjQv28vXd+S1lGlE/beuWzkGFAft/aM68ZjIMKJ6w/95ZH2yuzY/mxpyzKTokN8/fd/cPgkty08MD9f7I20VUzd1z/"
+    "JmoSXDRxw/l3vAwoNr5gV3NNaV508MF/OQYUG39KmIeVTtl86aOAPgOKjVyaHultS488ZlJ0AAARc2ABihigMwAAAABJRU5ErkJggg=="
+)
+
+@pytest.fixture(scope="module", autouse=True)
+def mock_storage(mock_gcs_client):
+    """Patch the library service's storage and Firestore clients once for the module"""
+    with patch("app.services.library_firestore.storage.Client") as mock, \
+         patch("app.services.library_firestore.get_firestore_client"):
+        mock.return_value = mock_gcs_client
+        yield mock
+
 
 class TestImageGenerationAPI:
     """Integration tests for /generate/image endpoint"""
@@ -13,29 +31,21 @@ class TestImageGenerationAPI:
     
     @patch("app.services.generation.image_client")
     @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
-    def test_requires_prompt(self, mock_storage, mock_genai_client, mock_image_client, client, mock_auth, mock_gcs_client):
+    def test_requires_prompt(self, mock_genai_client, mock_image_client, client, mock_auth):
         """Request without prompt returns 422"""
-        mock_storage.return_value = mock_gcs_client
-        
         response = client.post("/generate/image", json={})
         assert response.status_code == 422
     
     @patch("app.services.generation.image_client")
     @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
-    def test_successful_generation(
+    def test_image_flow(
         self, 
-        mock_storage, 
         mock_genai_client,
         mock_image_client,
         client, 
-        mock_auth,
-        mock_gcs_client
+        mock_auth
     ):
-        """Full successful image generation flow"""
-        mock_storage.return_value = mock_gcs_client
-        
+        """Image generation succeeds with and without reference images"""
         mock_part = MagicMock()
         mock_part.inline_data = MagicMock()
         mock_part.inline_data.data = b"fake_image_bytes"
@@ -56,57 +66,32 @@ class TestImageGenerationAPI:
         data = response.json()
         assert "images" in data
         assert len(data["images"]) == 1
-    
-    @patch("app.services.generation.image_client")
-    @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
-    def test_with_reference_images(
-        self,
-        mock_storage,
-        mock_genai_client,
-        mock_image_client,
-        client,
-        mock_auth,
-        mock_gcs_client
-    ):
-        """Generation with reference images"""
-        mock_storage.return_value = mock_gcs_client
-        
-        mock_part = MagicMock()
-        mock_part.inline_data = MagicMock()
-        mock_part.inline_data.data = b"fake_image_bytes"
         
-        mock_candidate = MagicMock()
-        mock_candidate.content.parts = [mock_part]
-        
-        mock_response = MagicMock()
-        mock_response.candidates = [mock_candidate]
-        mock_image_client.models.generate_content.return_value = mock_response
-        
-        ref_image = base64.b64encode(b"reference image").decode()
+        mock_image_client.models.generate_content.reset_mock()
         
         response = client.post("/generate/image", json={
             "prompt": "same style as reference",
-            "reference_images": [ref_image]
+            "reference_images": [_REF_IMAGE_B64]
         })
         
         assert response.status_code == 200
+        mock_image_client.models.generate_content.assert_called_once()
+        contents = mock_image_client.models.generate_content.call_args.kwargs["contents"]
+        image_parts = [part for part in contents if getattr(part, "inline_data", None)]
+        assert len(image_parts) == 1
+        assert image_parts[0].inline_data.data == base64.b64decode(_REF_IMAGE_B64)
+        assert image_parts[0].inline_data.mime_type == "image/png"
     
     @patch("app.services.generation.image_client")
     @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
     def test_no_images_returns_500(
         self,
-        mock_storage,
         mock_genai_client,
         mock_image_client,
         client,
-        mock_auth,
-        mock_gcs_client
+        mock_auth
     ):
         """No images generated returns 500"""
-        mock_storage.return_value = mock_gcs_client
-        
         mock_candidate = MagicMock()
         mock_candidate.content.parts = []
         
@@ -127,29 +112,15 @@ class TestVideoGenerationAPI:
         response = client.post("/generate/video", json={"prompt": "dancing cat"})
         assert response.status_code == 401
     
-    @patch("app.services.generation.httpx.AsyncClient")
-    @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
     def test_returns_operation_name(
         self,
-        mock_storage,
-        mock_genai_client,
-        mock_httpx,
         client,
         mock_auth,
-        mock_gcs_client,
+        vertex_transport,
         mock_vertex_response_video_started
     ):
         """Video generation returns operation name for polling"""
-        mock_storage.return_value = mock_gcs_client
-        
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = mock_vertex_response_video_started
-        
-        mock_http_client = AsyncMock()
-        mock_http_client.post.return_value = mock_response
-        mock_httpx.return_value.__aenter__.return_value = mock_http_client
+        vertex_transport(mock_vertex_response_video_started)
         
         response = client.post("/generate/video", json={
             "prompt": "a cat dancing",
@@ -173,29 +144,15 @@ class TestVideoStatusAPI:
         })
         assert response.status_code == 401
     
-    @patch("app.services.generation.httpx.AsyncClient")
-    @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
     def test_returns_complete_with_video(
         self,
-        mock_storage,
-        mock_genai_client,
-        mock_httpx,
         client,
         mock_auth,
-        mock_gcs_client,
+        vertex_transport,
         mock_vertex_response_video_complete
     ):
         """Completed video returns base64 data"""
-        mock_storage.return_value = mock_gcs_client
-        
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = mock_vertex_response_video_complete
-        
-        mock_http_client = AsyncMock()
-        mock_http_client.post.return_value = mock_response
-        mock_httpx.return_value.__aenter__.return_value = mock_http_client
+        vertex_transport(mock_vertex_response_video_complete)
         
         response = client.post("/generate/video/status", json={
             "operation_name": "projects/test/operations/123",
@@ -212,17 +169,12 @@ class TestTextGenerationAPI:
     """Integration tests for /generate/text endpoint"""
     
     @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
     def test_successful_generation(
         self,
-        mock_storage,
         mock_genai_client,
-        client,
-        mock_gcs_client
+        client
     ):
         """Text generation works without auth"""
-        mock_storage.return_value = mock_gcs_client
-        
         mock_response = MagicMock()
         mock_response.text = "Generated text response"
         mock_genai_client.models.generate_content.return_value = mock_response
@@ -232,20 +184,15 @@ class TestTextGenerationAPI:
         })
         
         assert response.status_code == 200
-        assert response.json()["response"] == "Generated text response"
+        assert b'"response":"Generated text response"' in response.content
     
     @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
     def test_with_system_prompt(
         self,
-        mock_storage,
         mock_genai_client,
-        client,
-        mock_gcs_client
+        client
     ):
         """Text generation with system prompt"""
-        mock_storage.return_value = mock_gcs_client
-        
         mock_response = MagicMock()
         mock_response.text = "Arrr, hello matey!"
         mock_genai_client.models.generate_content.return_value = mock_response
@@ -269,29 +216,15 @@ class TestUpscaleAPI:
         })
         assert response.status_code == 401
     
-    @patch("app.services.generation.httpx.AsyncClient")
-    @patch("app.services.generation.client")
-    @patch("app.services.library_firestore.storage.Client")
     def test_successful_upscale(
         self,
-        mock_storage,
-        mock_genai_client,
-        mock_httpx,
         client,
         mock_auth,
-        mock_gcs_client,
+        vertex_transport,
         mock_vertex_response_upscale
     ):
         """Successful image upscale"""
-        mock_storage.return_value = mock_gcs_client
-        
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = mock_vertex_response_upscale
-        
-        mock_http_client = AsyncMock()
-        mock_http_client.post.return_value = mock_response
-        mock_httpx.return_value.__aenter__.return_value = mock_http_client
+        vertex_transport(mock_vertex_response_upscale)
         
         response = client.post("/generate/upscale", json={
             "image": "smallimagebase64",
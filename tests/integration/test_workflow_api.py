@@ -3,57 +3,81 @@ Integration tests for workflow API endpoints
 Tests mock Firestore interactions but use real FastAPI routing
 """
 import pytest
+import orjson
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 
+_JSON_HEADERS = {"content-type": "application/json"}
+_TS = datetime(2024, 1, 1, 0, 0, 0)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def mock_get_client():
+    """Patch the Firestore client factory once for the whole module"""
+    with patch("app.services.workflow_firestore.get_firestore_client") as mock:
+        yield mock
+
+
+@pytest.fixture
+def firestore_mocks(mock_get_client):
+    """Pre-wired Firestore client, collection, query and document mocks"""
+    ns = SimpleNamespace(
+        client=MagicMock(),
+        collection=MagicMock(),
+        query=MagicMock(),
+        doc_ref=MagicMock(),
+        doc=MagicMock()
+    )
+    ns.client.collection.return_value = ns.collection
+    ns.collection.document.return_value = ns.doc_ref
+    ns.doc_ref.get.return_value = ns.doc
+    ns.collection.where.return_value = ns.query
+    ns.query.order_by.return_value = ns.query
+    ns.query.limit.return_value = ns.query
+    mock_get_client.return_value = ns.client
+    return ns
+
 
 class TestWorkflowCreateAPI:
     """Integration tests for POST /workflows/save endpoint"""
     
+    _MINIMAL_BODY = orjson.dumps({
+        "name": "Test",
+        "nodes": [{"id": "1"}],
+        "edges": []
+    })
+    _CREATE_BODY = orjson.dumps({
+        "name": "My Workflow",
+        "description": "Test workflow",
+        "is_public": False,
+        "nodes": [{"id": "node1", "type": "text", "data": {"text": "Hello"}}],
+        "edges": []
+    })
+    _MISSING_NAME_BODY = orjson.dumps({
+        "description": "Missing name",
+        "nodes": [],
+        "edges": []
+    })
+    
     def test_requires_authentication(self, client):
         """Request without auth returns 401"""
-        response = client.post("/workflows/save", json={
-            "name": "Test",
-            "nodes": [{"id": "1"}],
-            "edges": []
-        })
+        response = client.post("/workflows/save", content=self._MINIMAL_BODY, headers=_JSON_HEADERS)
         assert response.status_code == 401
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_creates_workflow_successfully(self, mock_get_client, client, mock_auth):
+    def test_creates_workflow_successfully(self, firestore_mocks, client, mock_auth):
         """Successfully creates a workflow"""
-        # Mock Firestore
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_doc = MagicMock()
-        mock_client.collection.return_value = mock_collection
-        mock_collection.document.return_value = mock_doc
-        mock_get_client.return_value = mock_client
-        
-        response = client.post("/workflows/save", json={
-            "name": "My Workflow",
-            "description": "Test workflow",
-            "is_public": False,
-            "nodes": [{"id": "node1", "type": "text", "data": {"text": "Hello"}}],
-            "edges": []
-        })
+        response = client.post("/workflows/save", content=self._CREATE_BODY, headers=_JSON_HEADERS)
         
         assert response.status_code == 200
         data = response.json()
         assert "id" in data
         assert isinstance(data["id"], str)
-        mock_doc.set.assert_called_once()
+        firestore_mocks.doc_ref.set.assert_called_once()
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_validates_required_fields(self, mock_get_client, client, mock_auth):
+    def test_validates_required_fields(self, firestore_mocks, client, mock_auth):
         """Validates required fields"""
-        mock_get_client.return_value = MagicMock()
-        
-        response = client.post("/workflows/save", json={
-            "description": "Missing name",
-            "nodes": [],
-            "edges": []
-        })
+        response = client.post("/workflows/save", content=self._MISSING_NAME_BODY, headers=_JSON_HEADERS)
         
         assert response.status_code == 422  # Validation error
 
@@ -66,36 +90,21 @@ class TestWorkflowListAPI:
         response = client.get("/workflows?scope=my")
         assert response.status_code == 401
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_lists_user_workflows(self, mock_get_client, client, mock_auth):
+    def test_lists_user_workflows(self, firestore_mocks, client, mock_auth):
         """Lists workflows for authenticated user"""
-        # Mock Firestore
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_query = MagicMock()
-        mock_doc = MagicMock()
-        
-        # Mock workflow document
-        mock_doc.to_dict.return_value = {
+        firestore_mocks.doc.to_dict.return_value = {
             "id": "wf1",
             "name": "My Workflow",
             "description": "Test",
             "user_id": "test-user-123",
             "user_email": "test@example.com",
             "is_public": False,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": _TS,
+            "updated_at": _TS,
             "nodes": [{"id": "1", "type": "text"}],
             "edges": []
         }
-        
-        mock_query.stream.return_value = [mock_doc]
-        mock_collection.where.return_value = mock_query
-        mock_query.order_by.return_value = mock_query
-        mock_query.limit.return_value = mock_query
-        
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
+        firestore_mocks.query.stream.return_value = [firestore_mocks.doc]
         
         response = client.get("/workflows?scope=my")
         
@@ -105,27 +114,14 @@ class TestWorkflowListAPI:
         assert len(data["workflows"]) == 1
         assert data["workflows"][0]["name"] == "My Workflow"
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_lists_public_workflows(self, mock_get_client, client, mock_auth):
+    def test_lists_public_workflows(self, firestore_mocks, client, mock_auth):
         """Lists public workflows"""
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_query = MagicMock()
-        
-        mock_query.stream.return_value = []
-        mock_collection.where.return_value = mock_query
-        mock_query.order_by.return_value = mock_query
-        mock_query.limit.return_value = mock_query
-        
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
+        firestore_mocks.query.stream.return_value = []
         
         response = client.get("/workflows?scope=public")
         
         assert response.status_code == 200
-        data = response.json()
-        assert "workflows" in data
-        assert isinstance(data["workflows"], list)
+        assert b'"workflows":[]' in response.content
 
 
 class TestWorkflowGetAPI:
@@ -136,33 +132,22 @@ class TestWorkflowGetAPI:
         response = client.get("/workflows/test-id")
         assert response.status_code == 401
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_gets_workflow_by_id(self, mock_get_client, client, mock_auth):
+    def test_gets_workflow_by_id(self, firestore_mocks, client, mock_auth):
         """Gets a specific workflow"""
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_doc_ref = MagicMock()
-        mock_doc = MagicMock()
-        
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
+        firestore_mocks.doc.exists = True
+        firestore_mocks.doc.to_dict.return_value = {
             "id": "wf1",
             "name": "My Workflow",
             "description": "Test",
             "user_id": "test-user-123",
             "user_email": "test@example.com",
             "is_public": False,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": _TS,
+            "updated_at": _TS,
             "nodes": [{"id": "1", "type": "text"}],
             "edges": []
         }
         
-        mock_collection.document.return_value = mock_doc_ref
-        mock_doc_ref.get.return_value = mock_doc
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
-        
         response = client.get("/workflows/wf1")
         
         assert response.status_code == 200
@@ -170,19 +155,9 @@ class TestWorkflowGetAPI:
         assert data["id"] == "wf1"
         assert data["name"] == "My Workflow"
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_returns_404_for_missing_workflow(self, mock_get_client, client, mock_auth):
+    def test_returns_404_for_missing_workflow(self, firestore_mocks, client, mock_auth):
         """Returns 404 when workflow doesn't exist"""
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_doc_ref = MagicMock()
-        mock_doc = MagicMock()
-        
-        mock_doc.exists = False
-        mock_collection.document.return_value = mock_doc_ref
-        mock_doc_ref.get.return_value = mock_doc
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
+        firestore_mocks.doc.exists = False
         
         response = client.get("/workflows/nonexistent")
         
@@ -192,46 +167,37 @@ class TestWorkflowGetAPI:
 class TestWorkflowUpdateAPI:
     """Integration tests for PUT /workflows/{id} endpoint"""
     
+    _MINIMAL_BODY = orjson.dumps({
+        "name": "Updated",
+        "nodes": [],
+        "edges": []
+    })
+    _UPDATE_BODY = orjson.dumps({
+        "name": "New Name",
+        "description": "Updated",
+        "is_public": True,
+        "nodes": [{"id": "1", "type": "text"}],
+        "edges": []
+    })
+    
     def test_requires_authentication(self, client):
         """Request without auth returns 401"""
-        response = client.put("/workflows/test-id", json={
-            "name": "Updated",
-            "nodes": [],
-            "edges": []
-        })
+        response = client.put("/workflows/test-id", content=self._MINIMAL_BODY, headers=_JSON_HEADERS)
         assert response.status_code == 401
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_updates_workflow(self, mock_get_client, client, mock_auth):
+    def test_updates_workflow(self, firestore_mocks, client, mock_auth):
         """Successfully updates a workflow"""
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_doc_ref = MagicMock()
-        mock_doc = MagicMock()
-        
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
+        firestore_mocks.doc.exists = True
+        firestore_mocks.doc.to_dict.return_value = {
             "id": "wf1",
             "user_id": "test-user-123",
             "name": "Old Name"
         }
         
-        mock_collection.document.return_value = mock_doc_ref
-        mock_doc_ref.get.return_value = mock_doc
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
-        
-        response = client.put("/workflows/wf1", json={
-            "name": "New Name",
-            "description": "Updated",
-            "is_public": True,
-            "nodes": [{"id": "1", "type": "text"}],
-            "edges": []
-        })
+        response = client.put("/workflows/wf1", content=self._UPDATE_BODY, headers=_JSON_HEADERS)
         
         assert response.status_code == 200
-        data = response.json()
-        assert data["message"] == "Workflow updated successfully"
+        assert b'"message":"Workflow updated successfully"' in response.content
 
 
 class TestWorkflowDeleteAPI:
@@ -242,32 +208,20 @@ class TestWorkflowDeleteAPI:
         response = client.delete("/workflows/test-id")
         assert response.status_code == 401
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_deletes_workflow(self, mock_get_client, client, mock_auth):
+    def test_deletes_workflow(self, firestore_mocks, client, mock_auth):
         """Successfully deletes a workflow"""
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_doc_ref = MagicMock()
-        mock_doc = MagicMock()
-        
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
+        firestore_mocks.doc.exists = True
+        firestore_mocks.doc.to_dict.return_value = {
             "id": "wf1",
             "user_id": "test-user-123",
             "name": "To Delete"
         }
         
-        mock_collection.document.return_value = mock_doc_ref
-        mock_doc_ref.get.return_value = mock_doc
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
-        
         response = client.delete("/workflows/wf1")
         
         assert response.status_code == 200
-        data = response.json()
-        assert data["message"] == "Workflow deleted successfully"
-        mock_doc_ref.delete.assert_called_once()
+        assert b'"message":"Workflow deleted successfully"' in response.content
+        firestore_mocks.doc_ref.delete.assert_called_once()
 
 
 class TestWorkflowCloneAPI:
@@ -278,17 +232,12 @@ class TestWorkflowCloneAPI:
         response = client.post("/workflows/test-id/clone")
         assert response.status_code == 401
     
-    @patch("app.services.workflow_firestore.get_firestore_client")
-    def test_clones_workflow(self, mock_get_client, client, mock_auth):
+    def test_clones_workflow(self, firestore_mocks, client, mock_auth):
         """Successfully clones a workflow"""
-        mock_client = MagicMock()
-        mock_collection = MagicMock()
-        mock_doc_ref = MagicMock()
-        mock_doc = MagicMock()
         mock_new_doc = MagicMock()
         
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
+        firestore_mocks.doc.exists = True
+        firestore_mocks.doc.to_dict.return_value = {
             "id": "wf1",
             "name": "Original",
             "description": "Original workflow",
@@ -300,13 +249,10 @@ class TestWorkflowCloneAPI:
         
         def mock_document(doc_id):
             if doc_id == "wf1":
-                return mock_doc_ref
+                return firestore_mocks.doc_ref
             return mock_new_doc
         
-        mock_collection.document = mock_document
-        mock_doc_ref.get.return_value = mock_doc
-        mock_client.collection.return_value = mock_collection
-        mock_get_client.return_value = mock_client
+        firestore_mocks.collection.document.side_effect = mock_document
         
         response = client.post("/workflows/wf1/clone")
         
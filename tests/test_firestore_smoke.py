@@ -5,6 +5,13 @@ Run with: pytest tests/test_firestore_smoke.py -v
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
+from google.cloud import storage
+from google.cloud.firestore import DocumentReference, DocumentSnapshot
+from app.services.library_firestore import LibraryServiceFirestore
+from app.services.workflow_firestore import WorkflowServiceFirestore
+
+_TS = datetime(2024, 1, 1, 0, 0, 0)
+_PNG_1x1_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
 
 
 @pytest.fixture
@@ -33,12 +40,10 @@ class TestWorkflowServiceFirestore:
     @patch('app.services.workflow_firestore.get_firestore_client')
     async def test_create_workflow(self, mock_get_client):
         """Test creating a workflow"""
-        from app.services.workflow_firestore import WorkflowServiceFirestore
-        
         # Setup mocks
         mock_client = MagicMock()
         mock_collection = MagicMock()
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentReference)
         mock_client.collection.return_value = mock_collection
         mock_collection.document.return_value = mock_doc
         mock_get_client.return_value = mock_client
@@ -64,13 +69,11 @@ class TestWorkflowServiceFirestore:
     @patch('app.services.workflow_firestore.get_firestore_client')
     async def test_list_workflows(self, mock_get_client):
         """Test listing workflows"""
-        from app.services.workflow_firestore import WorkflowServiceFirestore
-        
         # Setup mocks
         mock_client = MagicMock()
         mock_collection = MagicMock()
         mock_query = MagicMock()
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentSnapshot)
         
         # Mock document data
         mock_doc.to_dict.return_value = {
@@ -79,8 +82,8 @@ class TestWorkflowServiceFirestore:
             "description": "Test",
             "user_id": "test-user",
             "is_public": False,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": _TS,
+            "updated_at": _TS,
             "nodes": [],
             "edges": []
         }
@@ -106,33 +109,32 @@ class TestWorkflowServiceFirestore:
 class TestLibraryServiceFirestore:
     """Test LibraryServiceFirestore"""
     
+    @pytest.fixture(autouse=True)
+    def _wire(self, mock_gcs_client):
+        """Route storage.Client() to the shared GCS mock"""
+        with patch('app.services.library_firestore.storage.Client') as mock_storage_class:
+            mock_storage_class.return_value = mock_gcs_client
+            yield
+    
     @patch('app.services.library_firestore.get_firestore_client')
-    @patch('app.services.library_firestore.storage.Client')
-    async def test_save_asset(self, mock_storage_class, mock_get_client):
+    async def test_save_asset(self, mock_get_client, mock_gcs_client):
         """Test saving an asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
         # Setup Firestore mock
         mock_client = MagicMock()
         mock_collection = MagicMock()
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentReference)
         mock_client.collection.return_value = mock_collection
         mock_collection.document.return_value = mock_doc
         mock_get_client.return_value = mock_client
         
-        # Setup GCS mock
-        mock_storage = MagicMock()
-        mock_bucket = MagicMock()
-        mock_blob = MagicMock()
-        mock_storage.bucket.return_value = mock_bucket
-        mock_bucket.blob.return_value = mock_blob
-        mock_storage_class.return_value = mock_storage
+        mock_blob = Mock(spec=storage.Blob)
+        mock_gcs_client.bucket.return_value.blob.return_value = mock_blob
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore()
         
         # Save asset
         result = await service.save_asset(
-            data="iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==",
+            data=_PNG_1x1_B64,
             asset_type="image",
             user_id="test-user",
             prompt="Test prompt"
@@ -145,16 +147,13 @@ class TestLibraryServiceFirestore:
         mock_doc.set.assert_called_once()
     
     @patch('app.services.library_firestore.get_firestore_client')
-    @patch('app.services.library_firestore.storage.Client')
-    async def test_list_assets(self, mock_storage_class, mock_get_client):
+    async def test_list_assets(self, mock_get_client):
         """Test listing assets"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
         # Setup Firestore mock
         mock_client = MagicMock()
         mock_collection = MagicMock()
         mock_query = MagicMock()
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentSnapshot)
         
         # Mock document data
         mock_doc.to_dict.return_value = {
@@ -163,7 +162,7 @@ class TestLibraryServiceFirestore:
             "asset_type": "image",
             "blob_path": "users/test-user/images/asset1.png",
             "mime_type": "image/png",
-            "created_at": datetime.utcnow(),
+            "created_at": _TS,
             "prompt": "Test",
             "source": "generated"
         }
@@ -172,15 +171,12 @@ class TestLibraryServiceFirestore:
         mock_collection.where.return_value = mock_query
         mock_query.order_by.return_value = mock_query
         mock_query.limit.return_value = mock_query
+        mock_query.select.return_value = mock_query
         
         mock_client.collection.return_value = mock_collection
         mock_get_client.return_value = mock_client
         
-        # Setup GCS mock
-        mock_storage = MagicMock()
-        mock_storage_class.return_value = mock_storage
-        
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore()
         
         # List assets
         result = await service.list_assets(user_id="test-user", limit=50)
@@ -0,0 +1,153 @@
+"""
+Shared fixtures for unit tests
+"""
+import functools
+import pytest
+from google.api_core.exceptions import NotFound
+from types import SimpleNamespace
+from urllib.parse import urlencode
+from unittest.mock import MagicMock, patch
+from app.services.library_firestore import LibraryServiceFirestore
+
+
+@pytest.fixture(scope="module")
+def mock_library_service():
+    """Library service double; async methods such as save_asset are AsyncMocks"""
+    return MagicMock(spec=LibraryServiceFirestore)
+
+
+@pytest.fixture(autouse=True)
+def _reset_library_service(request):
+    """Clear calls and configured side effects on the shared library double"""
+    yield
+    if "mock_library_service" in request.fixturenames:
+        request.getfixturevalue("mock_library_service").reset_mock(return_value=True, side_effect=True)
+
+
+class _AsyncStub:
+    """Awaitable callable returning a preset value (or raising exc) and recording its calls"""
+    
+    def __init__(self, ret=None, exc=None):
+        self.ret = ret
+        self.exc = exc
+        self.calls = []
+    
+    async def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        if self.exc is not None:
+            raise self.exc
+        return self.ret
+
+
+@pytest.fixture(scope="session")
+def async_stub():
+    """Factory for service method stubs: async_stub(ret) returns ret, async_stub(exc=e) raises e"""
+    return _AsyncStub
+
+
+class _StubAsyncClient:
+    """Stand-in for httpx.AsyncClient whose context yields a shared client"""
+    
+    def __init__(self, inst, *args, **kwargs):
+        self.inst = inst
+    
+    async def __aenter__(self):
+        return self.inst
+    
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture
+def httpx_post(monkeypatch):
+    """Patch httpx.AsyncClient once; set() chooses what the next post() returns"""
+    inst = SimpleNamespace(post=_AsyncStub())
+    monkeypatch.setattr(
+        "app.services.generation.httpx.AsyncClient",
+        functools.partial(_StubAsyncClient, inst)
+    )
+    
+    def _set(json_body=None, status=200, text=""):
+        resp = SimpleNamespace(status_code=status, text=text, json=lambda: json_body)
+        inst.post.ret = resp
+        return resp
+    return SimpleNamespace(set=_set, client=inst)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _stub_firebase_init():
+    """Keep the real Firebase Admin SDK from initializing in unit tests"""
+    with patch("app.auth.firebase_admin.initialize_app") as m:
+        yield m
+
+
+@pytest.fixture
+def firebase_init(_stub_firebase_init):
+    """Session initialize_app stub with calls and side effects cleared"""
+    _stub_firebase_init.reset_mock()
+    yield _stub_firebase_init
+    _stub_firebase_init.reset_mock(side_effect=True)
+
+
+class _FakeBlob:
+    """In-memory stand-in for google.cloud.storage.Blob"""
+    
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+    
+    def upload_from_string(self, data, content_type=None):
+        self.bucket.requests.append(("upload", self.name))
+        if self.bucket.upload_error:
+            raise self.bucket.upload_error
+        self.bucket.objects[self.name] = (data, content_type)
+    
+    def generate_signed_url(
+        self, version=None, method="GET", expiration=None, content_type=None,
+        service_account_email=None, access_token=None
+    ):
+        self.bucket.requests.append(("sign", self.name))
+        params = {"method": method, "content_type": content_type, "expires": int(expiration.total_seconds())}
+        if service_account_email:
+            # Signed remotely through IAM signBlob rather than with a local key
+            params.update(signer=service_account_email, token=access_token)
+        query = urlencode(params)
+        return f"https://storage.fake/{self.bucket.name}/{self.name}?{query}"
+    
+    def exists(self):
+        self.bucket.requests.append(("exists", self.name))
+        return self.name in self.bucket.objects
+    
+    def delete(self):
+        self.bucket.requests.append(("delete", self.name))
+        if self.bucket.objects.pop(self.name, None) is None:
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+
+
+class _FakeBucket:
+    """In-memory bucket recording stored objects and the API calls made against it"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.objects = {}  # blob name -> (data, content_type)
+        self.requests = []  # (operation, blob name) per simulated API call
+        self.upload_error = None
+    
+    def blob(self, name):
+        return _FakeBlob(self, name)
+
+
+class _FakeGCSClient:
+    """In-memory stand-in for google.cloud.storage.Client"""
+    
+    def __init__(self):
+        self._buckets = {}
+    
+    def bucket(self, name):
+        return self._buckets.setdefault(name, _FakeBucket(name))
+
+
+@pytest.fixture
+def fake_gcs():
+    """Fresh in-memory GCS client; assert on service.bucket.objects and .requests"""
+    return _FakeGCSClient()
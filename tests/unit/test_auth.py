@@ -1,37 +1,32 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import MagicMock
 from fastapi import HTTPException
+import app.auth as auth_module
 from app.auth import verify_firebase_token, get_current_user, init_firebase
 
 
 class TestInitFirebase:
-    @patch("app.auth.firebase_admin.initialize_app")
-    def test_init_firebase_first_time(self, mock_init):
+    def test_init_firebase_first_time(self, firebase_init, monkeypatch):
         """First-time initialization succeeds"""
-        import app.auth as auth_module
-        auth_module._firebase_initialized = False
+        monkeypatch.setattr(auth_module, "_firebase_initialized", False)
         
         init_firebase()
         
-        mock_init.assert_called_once()
+        firebase_init.assert_called_once()
         assert auth_module._firebase_initialized is True
 
-    @patch("app.auth.firebase_admin.initialize_app")
-    def test_init_firebase_already_initialized(self, mock_init):
+    def test_init_firebase_already_initialized(self, firebase_init, monkeypatch):
         """Already initialized Firebase doesn't reinitialize"""
-        import app.auth as auth_module
-        auth_module._firebase_initialized = True
+        monkeypatch.setattr(auth_module, "_firebase_initialized", True)
         
         init_firebase()
         
-        mock_init.assert_not_called()
+        firebase_init.assert_not_called()
 
-    @patch("app.auth.firebase_admin.initialize_app")
-    def test_init_firebase_value_error(self, mock_init):
+    def test_init_firebase_value_error(self, firebase_init, monkeypatch):
         """ValueError from Firebase (already initialized externally) is handled"""
-        import app.auth as auth_module
-        auth_module._firebase_initialized = False
-        mock_init.side_effect = ValueError("Already initialized")
+        monkeypatch.setattr(auth_module, "_firebase_initialized", False)
+        firebase_init.side_effect = ValueError("Already initialized")
         
         init_firebase()
         
@@ -39,6 +34,14 @@ class TestInitFirebase:
 
 
 class TestVerifyFirebaseToken:
+    @pytest.fixture
+    def mock_verify(self, monkeypatch):
+        """Stub Firebase initialization and token verification"""
+        verify = MagicMock()
+        monkeypatch.setattr("app.auth.firebase_auth.verify_id_token", verify)
+        monkeypatch.setattr("app.auth.init_firebase", lambda: None)
+        return verify
+    
     def test_missing_token_raises_401(self):
         """No token returns 401"""
         with pytest.raises(HTTPException) as exc:
@@ -52,23 +55,26 @@ class TestVerifyFirebaseToken:
             verify_firebase_token("")
         assert exc.value.status_code == 401
 
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_valid_token_allowed_user(self, mock_init, mock_verify):
-        """Valid token for whitelisted user returns user info"""
+    @pytest.mark.parametrize("authorization,email,expected_token", [
+        ("Bearer valid-token", "ldebortolialves@hubspot.com", "valid-token"),
+        ("Bearer my-token", "ldebortolialves@hubspot.com", "my-token"),
+        ("raw-token", "ldebortolialves@hubspot.com", "raw-token"),
+        ("Bearer token", "LDEBORTOLIALVES@HUBSPOT.COM", "token"),
+    ])
+    def test_token_accepted(self, mock_verify, authorization, email, expected_token):
+        """Whitelisted users are accepted with or without Bearer prefix, case-insensitively"""
         mock_verify.return_value = {
             "uid": "user-123",
-            "email": "ldebortolialves@hubspot.com"
+            "email": email
         }
         
-        result = verify_firebase_token("Bearer valid-token")
+        result = verify_firebase_token(authorization)
         
         assert result["uid"] == "user-123"
         assert result["email"] == "ldebortolialves@hubspot.com"
+        mock_verify.assert_called_once_with(expected_token)
 
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_valid_token_unauthorized_user(self, mock_init, mock_verify):
+    def test_valid_token_unauthorized_user(self, mock_verify):
         """Valid token for non-whitelisted user returns 403"""
         mock_verify.return_value = {
             "uid": "user-456",
@@ -80,45 +86,16 @@ class TestVerifyFirebaseToken:
         assert exc.value.status_code == 403
         assert "not authorized" in exc.value.detail
 
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_bearer_prefix_stripped(self, mock_init, mock_verify):
-        """Bearer prefix is removed before verification"""
-        mock_verify.return_value = {
-            "uid": "user-123",
-            "email": "ldebortolialves@hubspot.com"
-        }
-        
-        verify_firebase_token("Bearer my-token")
-        mock_verify.assert_called_once_with("my-token")
-
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_token_without_bearer_prefix(self, mock_init, mock_verify):
-        """Token without Bearer prefix still works"""
-        mock_verify.return_value = {
-            "uid": "user-123",
-            "email": "ldebortolialves@hubspot.com"
-        }
-        
-        verify_firebase_token("raw-token")
-        mock_verify.assert_called_once_with("raw-token")
-
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_email_case_insensitive(self, mock_init, mock_verify):
-        """Email matching is case-insensitive"""
-        mock_verify.return_value = {
-            "uid": "user-123",
-            "email": "LDEBORTOLIALVES@HUBSPOT.COM"
-        }
+    def test_whitelist_entries_normalized(self, mock_verify, monkeypatch):
+        """Mixed-case, padded ALLOWED_EMAILS entries still match the token email"""
+        monkeypatch.setattr(auth_module, "_allowed_emails", auth_module._normalize_emails(["  New.User@Example.COM "]))
+        mock_verify.return_value = {"uid": "user-123", "email": "new.user@example.com"}
         
         result = verify_firebase_token("Bearer token")
-        assert result["email"] == "ldebortolialves@hubspot.com"
+        
+        assert result["email"] == "new.user@example.com"
 
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_firebase_error_raises_401(self, mock_init, mock_verify):
+    def test_firebase_error_raises_401(self, mock_verify):
         """Verification error returns 401"""
         mock_verify.side_effect = ValueError("Token validation failed")
         
@@ -126,9 +103,7 @@ class TestVerifyFirebaseToken:
             verify_firebase_token("Bearer invalid-token")
         assert exc.value.status_code == 401
 
-    @patch("app.auth.firebase_auth.verify_id_token")
-    @patch("app.auth.init_firebase")
-    def test_unexpected_error_raises_401(self, mock_init, mock_verify):
+    def test_unexpected_error_raises_401(self, mock_verify):
         """Unexpected error returns 401"""
         mock_verify.side_effect = RuntimeError("Unexpected error")
         
@@ -139,11 +114,12 @@ class TestVerifyFirebaseToken:
 
 
 class TestGetCurrentUser:
-    @pytest.mark.asyncio
-    @patch("app.auth.verify_firebase_token")
-    async def test_returns_user_info(self, mock_verify):
+    async def test_returns_user_info(self, monkeypatch):
         """Dependency returns user info"""
-        mock_verify.return_value = {"uid": "123", "email": "test@test.com"}
+        monkeypatch.setattr(
+            "app.auth.verify_firebase_token",
+            MagicMock(return_value={"uid": "123", "email": "test@test.com"})
+        )
         
         result = await get_current_user("Bearer token")
         
@@ -3,8 +3,60 @@ Comprehensive tests for LibraryServiceFirestore
 """
 import pytest
 import base64
+import functools
 from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from datetime import datetime, timedelta, timezone
+from google.auth import compute_engine
+from google.oauth2 import credentials as user_credentials, service_account
+from google.cloud.firestore import DocumentReference, DocumentSnapshot
+from app.services.library_firestore import ASSET_RESPONSE_FIELDS, LibraryServiceFirestore, UploadNotFoundError
+
+
+# Simple 1x1 PNG base64
+_PNG_1x1_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+_FAKE_IMG_B64 = base64.b64encode(b"test").decode()
+_FAKE_VIDEO_B64 = base64.b64encode(b"fake video data").decode()
+
+_CREATED_AT = datetime(2024, 1, 1, 0, 0, 0)
+
+
+@functools.lru_cache(maxsize=64)
+def _asset_doc(asset_id="asset1", user_id="user123", asset_type="image"):
+    """Asset document dict, built once per (id, user, type); copy before handing it to the service"""
+    ext, mime_type = ("mp4", "video/mp4") if asset_type == "video" else ("png", "image/png")
+    return {
+        "id": asset_id,
+        "user_id": user_id,
+        "asset_type": asset_type,
+        "blob_path": f"users/{user_id}/{asset_type}s/{asset_id}.{ext}",
+        "mime_type": mime_type,
+        "created_at": _CREATED_AT,
+        "prompt": "Test",
+        "source": "generated"
+    }
+
+
+def _snapshot(asset_id="asset1", user_id="user123", asset_type="image"):
+    """Existing document snapshot returning a fresh copy of the cached asset dict"""
+    doc = Mock(spec=DocumentSnapshot)
+    doc.id = asset_id
+    doc.exists = True
+    doc.to_dict.return_value = dict(_asset_doc(asset_id, user_id, asset_type))
+    return doc
+
+
+def _pending_upload(user_id="user123", expires_at=None):
+    """Pending upload snapshot; expires_at defaults to a signed URL that is still valid"""
+    data = {
+        **_asset_doc(user_id=user_id),
+        "source": "upload",
+        "expires_at": expires_at or datetime.utcnow() + timedelta(minutes=15)
+    }
+    return Mock(spec=DocumentSnapshot, exists=True, to_dict=Mock(return_value=data))
+
+
+_OTHER_USER_ASSET = _asset_doc(user_id="other-user")
 
 
 @pytest.fixture
@@ -18,34 +70,17 @@ def mock_firestore_client():
         yield mock_client
 
 
-@pytest.fixture
-def mock_gcs():
-    """Mock GCS client"""
-    with patch('app.services.library_firestore.storage.Client') as mock_storage_class:
-        mock_storage = MagicMock()
-        mock_bucket = MagicMock()
-        mock_blob = MagicMock()
-        mock_storage.bucket.return_value = mock_bucket
-        mock_bucket.blob.return_value = mock_blob
-        mock_storage_class.return_value = mock_storage
-        yield mock_storage, mock_bucket, mock_blob
-
-
 class TestLibraryServiceFirestoreSave:
     """Test asset saving"""
     
-    async def test_save_image_success(self, mock_firestore_client, mock_gcs):
+    async def test_save_image_success(self, mock_firestore_client, fake_gcs):
         """Test saving image asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, mock_bucket, mock_blob = mock_gcs
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentReference)
         mock_firestore_client.collection.return_value.document.return_value = mock_doc
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        # Simple 1x1 PNG base64
-        image_data = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        image_data = _PNG_1x1_B64
         
         result = await service.save_asset(
             data=image_data,
@@ -57,20 +92,17 @@ class TestLibraryServiceFirestoreSave:
         assert result.asset_type == "image"
         assert result.prompt == "Test image"
         assert result.id is not None
-        mock_blob.upload_from_string.assert_called_once()
+        assert len(service.bucket.objects) == 1
         mock_doc.set.assert_called_once()
     
-    async def test_save_video_success(self, mock_firestore_client, mock_gcs):
+    async def test_save_video_success(self, mock_firestore_client, fake_gcs):
         """Test saving video asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, mock_bucket, mock_blob = mock_gcs
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentReference)
         mock_firestore_client.collection.return_value.document.return_value = mock_doc
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        video_data = base64.b64encode(b"fake video data").decode()
+        video_data = _FAKE_VIDEO_B64
         
         result = await service.save_asset(
             data=video_data,
@@ -82,20 +114,17 @@ class TestLibraryServiceFirestoreSave:
         
         assert result.asset_type == "video"
         assert result.mime_type == "video/mp4"
-        mock_blob.upload_from_string.assert_called_once()
+        assert len(service.bucket.objects) == 1
     
-    async def test_save_asset_strips_base64_prefix(self, mock_firestore_client, mock_gcs):
+    async def test_save_asset_strips_base64_prefix(self, mock_firestore_client, fake_gcs):
         """Test stripping data URL prefix"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, mock_bucket, mock_blob = mock_gcs
-        mock_doc = MagicMock()
+        mock_doc = Mock(spec=DocumentReference)
         mock_firestore_client.collection.return_value.document.return_value = mock_doc
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
         # Data URL with prefix
-        image_data = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        image_data = "data:image/png;base64," + _PNG_1x1_B64
         
         result = await service.save_asset(
             data=image_data,
@@ -104,33 +133,75 @@ class TestLibraryServiceFirestoreSave:
         )
         
         assert result.id is not None
-        mock_blob.upload_from_string.assert_called_once()
+        assert [data for data, _ in service.bucket.objects.values()] == [base64.b64decode(_PNG_1x1_B64)]
     
-    async def test_save_asset_invalid_type(self, mock_firestore_client, mock_gcs):
-        """Test invalid asset type raises error"""
-        from app.services.library_firestore import LibraryServiceFirestore
+    async def test_save_asset_malformed_data_url(self, mock_firestore_client, fake_gcs):
+        """Test a data URL header without a comma is rejected, not decoded as payload"""
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        mock_storage, _, _ = mock_gcs
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        with pytest.raises(ValueError, match="Malformed data URL"):
+            await service.save_asset(data="data:image/png;base64" + _PNG_1x1_B64, asset_type="image", user_id="user123")
         
-        with pytest.raises(ValueError, match="asset_type must be"):
+        assert service.bucket.objects == {}
+    
+    @pytest.mark.parametrize("asset_type,user_id,match", [
+        ("invalid", "user123", "asset_type must be"),
+        ("image", "", "user_id is required"),
+    ])
+    async def test_save_asset_rejected_before_decoding(self, mock_firestore_client, fake_gcs, asset_type, user_id, match):
+        """Test request validation runs before the payload is decoded"""
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        # Non-ASCII data would fail to decode; the validation error must win
+        with pytest.raises(ValueError, match=match):
+            await service.save_asset(data="\u00e9" * 1024, asset_type=asset_type, user_id=user_id)
+        
+        assert service.bucket.requests == []
+        mock_firestore_client.collection.return_value.document.assert_not_called()
+    
+    async def test_save_asset_upload_failure_writes_no_metadata(self, mock_firestore_client, fake_gcs):
+        """Test a failed GCS upload never creates the asset document"""
+        mock_doc = Mock(spec=DocumentReference)
+        mock_firestore_client.collection.return_value.document.return_value = mock_doc
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        service.bucket.upload_error = Exception("Upload failed")
+        
+        with pytest.raises(Exception, match="Upload failed"):
             await service.save_asset(
-                data="somedata",
-                asset_type="invalid",
+                data=_PNG_1x1_B64,
+                asset_type="image",
                 user_id="user123"
             )
+        
+        mock_doc.set.assert_not_called()
     
-    async def test_save_asset_with_workflow_id(self, mock_firestore_client, mock_gcs):
-        """Test saving asset with workflow reference"""
-        from app.services.library_firestore import LibraryServiceFirestore
+    async def test_save_asset_metadata_failure_deletes_blob(self, mock_firestore_client, fake_gcs):
+        """Test a failed metadata write removes the already uploaded file"""
+        mock_doc = Mock(spec=DocumentReference)
+        mock_doc.set.side_effect = Exception("Firestore unavailable")
+        mock_firestore_client.collection.return_value.document.return_value = mock_doc
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        with pytest.raises(Exception, match="Firestore unavailable"):
+            await service.save_asset(
+                data=_PNG_1x1_B64,
+                asset_type="image",
+                user_id="user123"
+            )
         
-        mock_storage, mock_bucket, mock_blob = mock_gcs
-        mock_doc = MagicMock()
+        assert [op for op, _ in service.bucket.requests] == ["upload", "delete"]
+        assert service.bucket.objects == {}
+    
+    async def test_save_asset_with_workflow_id(self, mock_firestore_client, fake_gcs):
+        """Test saving asset with workflow reference"""
+        mock_doc = Mock(spec=DocumentReference)
         mock_firestore_client.collection.return_value.document.return_value = mock_doc
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        image_data = base64.b64encode(b"test").decode()
+        image_data = _FAKE_IMG_B64
         
         result = await service.save_asset(
             data=image_data,
@@ -150,41 +221,25 @@ class TestLibraryServiceFirestoreSave:
 class TestLibraryServiceFirestoreList:
     """Test asset listing"""
     
-    async def test_list_assets_empty(self, mock_firestore_client, mock_gcs):
+    async def test_list_assets_empty(self, mock_firestore_client, fake_gcs):
         """Test listing with no assets"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
         mock_query = MagicMock()
         mock_query.stream.return_value = []
         mock_collection = mock_firestore_client.collection.return_value
         mock_collection.where.return_value = mock_query
         mock_query.order_by.return_value = mock_query
         mock_query.limit.return_value = mock_query
+        mock_query.select.return_value = mock_query
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         result = await service.list_assets(user_id="user123", limit=50)
         
         assert len(result.assets) == 0
         assert result.count == 0
     
-    async def test_list_assets_with_results(self, mock_firestore_client, mock_gcs):
+    async def test_list_assets_with_results(self, mock_firestore_client, fake_gcs):
         """Test listing with assets"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.to_dict.return_value = {
-            "id": "asset1",
-            "user_id": "user123",
-            "asset_type": "image",
-            "blob_path": "users/user123/images/asset1.png",
-            "mime_type": "image/png",
-            "created_at": datetime.utcnow(),
-            "prompt": "Test",
-            "source": "generated"
-        }
+        mock_doc = _snapshot()
         
         mock_query = MagicMock()
         mock_query.stream.return_value = [mock_doc]
@@ -192,30 +247,19 @@ class TestLibraryServiceFirestoreList:
         mock_collection.where.return_value = mock_query
         mock_query.order_by.return_value = mock_query
         mock_query.limit.return_value = mock_query
+        mock_query.select.return_value = mock_query
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         result = await service.list_assets(user_id="user123", limit=50)
         
         assert len(result.assets) == 1
         assert result.assets[0].asset_type == "image"
         assert result.count == 1
+        mock_query.select.assert_called_once_with(ASSET_RESPONSE_FIELDS)
     
-    async def test_list_assets_filtered_by_type(self, mock_firestore_client, mock_gcs):
+    async def test_list_assets_filtered_by_type(self, mock_firestore_client, fake_gcs):
         """Test filtering by asset type"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.to_dict.return_value = {
-            "id": "video1",
-            "user_id": "user123",
-            "asset_type": "video",
-            "blob_path": "users/user123/videos/video1.mp4",
-            "mime_type": "video/mp4",
-            "created_at": datetime.utcnow(),
-            "source": "generated"
-        }
+        mock_doc = _snapshot("video1", asset_type="video")
         
         mock_query = MagicMock()
         mock_query2 = MagicMock()
@@ -225,8 +269,9 @@ class TestLibraryServiceFirestoreList:
         mock_query.where.return_value = mock_query2  # Chain the second where
         mock_query2.order_by.return_value = mock_query2
         mock_query2.limit.return_value = mock_query2
+        mock_query2.select.return_value = mock_query2
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         result = await service.list_assets(
             user_id="user123",
             asset_type="video",
@@ -235,193 +280,292 @@ class TestLibraryServiceFirestoreList:
         
         assert len(result.assets) == 1
         assert result.assets[0].asset_type == "video"
+    
+    async def test_list_assets_paginates(self, mock_firestore_client, fake_gcs):
+        """Test a full page returns a token that resumes after its last asset"""
+        cursor = _snapshot("asset2")
+        mock_query = MagicMock()
+        mock_query.stream.side_effect = [[_snapshot("asset1"), cursor], [_snapshot("asset3")]]
+        mock_collection = mock_firestore_client.collection.return_value
+        mock_collection.where.return_value = mock_query
+        mock_collection.document.return_value.get.return_value = cursor
+        mock_query.order_by.return_value = mock_query
+        mock_query.start_after.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.select.return_value = mock_query
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        first = await service.list_assets(user_id="user123", limit=2)
+        second = await service.list_assets(user_id="user123", limit=2, page_token=first.next_page_token)
+        
+        assert [a.id for a in first.assets] == ["asset1", "asset2"]
+        assert first.next_page_token == "asset2"
+        mock_collection.document.assert_called_with("asset2")
+        mock_query.start_after.assert_called_once_with(cursor)
+        assert [a.id for a in second.assets] == ["asset3"]
+        assert second.next_page_token is None
+    
+    async def test_list_assets_rejects_foreign_page_token(self, mock_firestore_client, fake_gcs):
+        """Test a page token for another user's asset is rejected"""
+        mock_collection = mock_firestore_client.collection.return_value
+        mock_collection.document.return_value.get.return_value = _snapshot(user_id="other-user")
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        with pytest.raises(ValueError, match="Invalid page token"):
+            await service.list_assets(user_id="user123", page_token="asset1")
 
 
 class TestLibraryServiceFirestoreGet:
     """Test getting single asset"""
     
-    async def test_get_asset_success(self, mock_firestore_client, mock_gcs):
+    async def test_get_asset_success(self, mock_firestore_client, fake_gcs):
         """Test getting asset by ID"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            "id": "asset1",
-            "user_id": "user123",
-            "asset_type": "image",
-            "blob_path": "users/user123/images/asset1.png",
-            "mime_type": "image/png",
-            "created_at": datetime.utcnow(),
-            "prompt": "Test"
-        }
+        mock_doc = _snapshot()
         
-        mock_doc_ref = MagicMock()
+        mock_doc_ref = Mock(spec=DocumentReference)
         mock_doc_ref.get.return_value = mock_doc
         mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         result = await service.get_asset(asset_id="asset1", user_id="user123")
         
         assert result.id == "asset1"
         assert result.asset_type == "image"
+
+
+class TestLibraryServiceFirestoreDirectUpload:
+    """Test signed-URL uploads that bypass the API"""
     
-    async def test_get_asset_not_found(self, mock_firestore_client, mock_gcs):
-        """Test asset not found"""
-        from app.services.library_firestore import LibraryServiceFirestore
+    async def test_create_upload_url_returns_signed_put(self, mock_firestore_client, fake_gcs):
+        """Test a signed PUT URL is issued and the asset is held as pending"""
+        mock_doc = Mock(spec=DocumentReference)
+        mock_firestore_client.collection.return_value.document.return_value = mock_doc
         
-        mock_storage, _, _ = mock_gcs
+        service = LibraryServiceFirestore(gcs_client=fake_gcs, credentials=Mock(spec=service_account.Credentials))
+        result = await service.create_upload_url(user_id="user123", asset_type="video")
+        
+        url = urlsplit(result["upload_url"])
+        assert parse_qs(url.query) == {"method": ["PUT"], "content_type": ["video/mp4"], "expires": ["900"]}
+        assert url.path.endswith(f"users/user123/videos/{result['asset_id']}.mp4")
+        assert result["mime_type"] == "video/mp4"
+        assert service.bucket.objects == {}
+        mock_firestore_client.collection.assert_any_call("uploads")
+        pending = mock_doc.set.call_args.args[0]
+        assert pending["source"] == "upload"
+        assert "expires_at" in pending
+    
+    async def test_create_upload_url_without_private_key(self, mock_firestore_client, fake_gcs):
+        """Test token-only credentials (Cloud Run / GCE) sign through the IAM API"""
+        credentials = Mock(spec=compute_engine.Credentials, valid=False, service_account_email="default", token=None)
+        
+        def refresh(request):
+            credentials.service_account_email = "app@project.iam.gserviceaccount.com"
+            credentials.token = "access-token"
+        credentials.refresh.side_effect = refresh
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs, credentials=credentials)
+        result = await service.create_upload_url(user_id="user123", asset_type="image")
+        
+        credentials.refresh.assert_called_once()
+        query = parse_qs(urlsplit(result["upload_url"]).query)
+        assert query["signer"] == ["app@project.iam.gserviceaccount.com"]
+        assert query["token"] == ["access-token"]
+    
+    async def test_create_upload_url_user_credentials(self, mock_firestore_client, fake_gcs):
+        """Test user ADC credentials fail with a clear error instead of an AttributeError"""
+        credentials = Mock(spec=user_credentials.Credentials)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs, credentials=credentials)
         
-        mock_doc = MagicMock()
-        mock_doc.exists = False
+        with pytest.raises(RuntimeError, match="requires service account credentials"):
+            await service.create_upload_url(user_id="user123", asset_type="image")
         
-        mock_doc_ref = MagicMock()
-        mock_doc_ref.get.return_value = mock_doc
+        credentials.refresh.assert_not_called()
+        mock_firestore_client.collection.return_value.document.return_value.set.assert_not_called()
+    
+    async def test_create_upload_url_default_credentials(self, mock_firestore_client, fake_gcs):
+        """Test signing credentials come from google.auth.default() once when not given"""
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        with patch(
+            "app.services.library_firestore.google.auth.default",
+            return_value=(Mock(spec=service_account.Credentials), "project")
+        ) as mock_default:
+            await service.create_upload_url(user_id="user123", asset_type="image")
+            await service.create_upload_url(user_id="user123", asset_type="video")
+        
+        mock_default.assert_called_once()
+    
+    async def test_create_upload_url_invalid_type(self, mock_firestore_client, fake_gcs):
+        """Test invalid asset type is rejected before signing"""
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        with pytest.raises(ValueError, match="asset_type must be"):
+            await service.create_upload_url(user_id="user123", asset_type="audio")
+        
+        assert service.bucket.requests == []
+    
+    async def test_finalize_upload_publishes_asset(self, mock_firestore_client, fake_gcs):
+        """Test a completed upload moves into the asset library"""
+        mock_doc_ref = Mock(spec=DocumentReference)
+        mock_doc_ref.get.return_value = _pending_upload()
+        pending = mock_doc_ref.get.return_value.to_dict()
         mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        service.bucket.objects[pending["blob_path"]] = (b"png", "image/png")
+        result = await service.finalize_upload(asset_id="asset1", user_id="user123")
         
-        with pytest.raises(ValueError, match="not found"):
-            await service.get_asset(asset_id="nonexistent", user_id="user123")
+        assert result.id == "asset1"
+        assert result.url.endswith(pending["blob_path"])
+        published = mock_doc_ref.set.call_args.args[0]
+        assert "expires_at" not in published
+        assert published["source"] == "upload"
+        mock_doc_ref.delete.assert_called_once()
     
-    async def test_get_asset_access_denied(self, mock_firestore_client, mock_gcs):
-        """Test accessing other user's asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
+    async def test_finalize_upload_before_put(self, mock_firestore_client, fake_gcs):
+        """Test finalizing without an uploaded file leaves the upload pending"""
+        mock_doc_ref = Mock(spec=DocumentReference)
+        mock_doc_ref.get.return_value = _pending_upload()
+        mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        mock_storage, _, _ = mock_gcs
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            "id": "asset1",
-            "user_id": "other-user",
-            "asset_type": "image"
-        }
+        with pytest.raises(ValueError, match="Upload has not completed"):
+            await service.finalize_upload(asset_id="asset1", user_id="user123")
         
-        mock_doc_ref = MagicMock()
-        mock_doc_ref.get.return_value = mock_doc
+        mock_doc_ref.set.assert_not_called()
+        mock_doc_ref.delete.assert_not_called()
+    
+    async def test_finalize_upload_other_user(self, mock_firestore_client, fake_gcs):
+        """Test users cannot finalize someone else's upload"""
+        mock_doc_ref = Mock(spec=DocumentReference)
+        mock_doc_ref.get.return_value = _pending_upload(user_id="other-user")
+        mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        with pytest.raises(PermissionError):
+            await service.finalize_upload(asset_id="asset1", user_id="user123")
+    
+    async def test_finalize_upload_not_found(self, mock_firestore_client, fake_gcs):
+        """Test finalizing an unknown upload raises UploadNotFoundError"""
+        mock_firestore_client.collection.return_value.document.return_value.get.return_value = Mock(
+            spec=DocumentSnapshot, exists=False
+        )
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        with pytest.raises(UploadNotFoundError, match="Upload not found"):
+            await service.finalize_upload(asset_id="asset1", user_id="user123")
+    
+    async def test_finalize_upload_expired_with_file(self, mock_firestore_client, fake_gcs):
+        """Test a file PUT before expiry still finalizes after the pending upload expires"""
+        # Firestore returns timezone-aware timestamps
+        expired = _pending_upload(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+        mock_doc_ref = Mock(spec=DocumentReference)
+        mock_doc_ref.get.return_value = expired
+        mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        blob_path = expired.to_dict()["blob_path"]
+        service.bucket.objects[blob_path] = (b"png", "image/png")
+        
+        result = await service.finalize_upload(asset_id="asset1", user_id="user123")
+        
+        assert result.id == "asset1"
+        mock_doc_ref.set.assert_called_once()
+        assert blob_path in service.bucket.objects
+    
+    async def test_finalize_upload_expired_without_file(self, mock_firestore_client, fake_gcs):
+        """Test an expired upload with no file is rejected and left to the uploads TTL policy"""
+        mock_doc_ref = Mock(spec=DocumentReference)
+        mock_doc_ref.get.return_value = _pending_upload(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
         mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        with pytest.raises(PermissionError, match="Access denied"):
-            await service.get_asset(asset_id="asset1", user_id="user123")
+        with pytest.raises(ValueError, match="Upload expired"):
+            await service.finalize_upload(asset_id="asset1", user_id="user123")
+        
+        mock_doc_ref.set.assert_not_called()
+        mock_doc_ref.delete.assert_not_called()
 
 
 class TestLibraryServiceFirestoreDelete:
     """Test asset deletion"""
     
-    async def test_delete_asset_success(self, mock_firestore_client, mock_gcs):
+    async def test_delete_asset_success(self, mock_firestore_client, fake_gcs):
         """Test deleting asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, mock_bucket, mock_blob = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            "id": "asset1",
-            "user_id": "user123",
-            "blob_path": "users/user123/images/asset1.png"
-        }
+        mock_doc = _snapshot()
         
-        mock_doc_ref = MagicMock()
+        mock_doc_ref = Mock(spec=DocumentReference)
         mock_doc_ref.get.return_value = mock_doc
         mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        blob_path = mock_doc.to_dict.return_value["blob_path"]
+        service.bucket.objects[blob_path] = (b"png", "image/png")
         result = await service.delete_asset(asset_id="asset1", user_id="user123")
         
         assert result is not None
-        mock_blob.delete.assert_called_once()
+        assert service.bucket.requests == [("delete", blob_path)]
+        assert service.bucket.objects == {}
         mock_doc_ref.delete.assert_called_once()
     
-    async def test_delete_asset_not_found(self, mock_firestore_client, mock_gcs):
-        """Test deleting non-existent asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.exists = False
-        
-        mock_doc_ref = MagicMock()
-        mock_doc_ref.get.return_value = mock_doc
+    async def test_delete_asset_missing_blob(self, mock_firestore_client, fake_gcs):
+        """Test metadata is still deleted when the file is already gone"""
+        mock_doc_ref = Mock(spec=DocumentReference)
+        mock_doc_ref.get.return_value = _snapshot()
         mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        result = await service.delete_asset(asset_id="asset1", user_id="user123")
         
-        with pytest.raises(ValueError, match="not found"):
-            await service.delete_asset(asset_id="nonexistent", user_id="user123")
+        assert result == {"status": "deleted", "id": "asset1"}
+        mock_doc_ref.delete.assert_called_once()
+
+
+class TestLibraryServiceFirestoreLookupErrors:
+    """Test missing and foreign assets on get/delete"""
     
-    async def test_delete_asset_access_denied(self, mock_firestore_client, mock_gcs):
-        """Test deleting other user's asset"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            "id": "asset1",
-            "user_id": "other-user"
-        }
-        
-        mock_doc_ref = MagicMock()
+    @pytest.mark.parametrize("method, exists, data, error, match", [
+        ("get_asset", False, None, ValueError, "not found"),
+        ("get_asset", True, _OTHER_USER_ASSET, PermissionError, "Access denied"),
+        ("delete_asset", False, None, ValueError, "not found"),
+        ("delete_asset", True, _OTHER_USER_ASSET, PermissionError, "Access denied"),
+    ])
+    async def test_lookup_errors(self, mock_firestore_client, fake_gcs, method, exists, data, error, match):
+        """Missing assets raise ValueError, other users' assets raise PermissionError"""
+        mock_doc = Mock(spec=DocumentSnapshot)
+        mock_doc.exists = exists
+        mock_doc.to_dict.return_value = dict(data) if data else data
+        
+        mock_doc_ref = Mock(spec=DocumentReference)
         mock_doc_ref.get.return_value = mock_doc
         mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
         
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
-        with pytest.raises(PermissionError, match="Access denied"):
-            await service.delete_asset(asset_id="asset1", user_id="user123")
+        with pytest.raises(error, match=match):
+            await getattr(service, method)(asset_id="asset1", user_id="user123")
+        mock_doc_ref.delete.assert_not_called()
 
 
 class TestLibraryServiceFirestoreURLResolution:
     """Test batch URL resolution"""
     
-    async def test_resolve_asset_urls_batch(self, mock_firestore_client, mock_gcs):
+    async def test_resolve_asset_urls_batch(self, mock_firestore_client, fake_gcs):
         """Test resolving multiple asset URLs"""
-        from app.services.library_firestore import LibraryServiceFirestore
-        
-        mock_storage, _, _ = mock_gcs
+        mock_doc1 = _snapshot("asset1")
+        mock_doc2 = _snapshot("asset2")
+        mock_firestore_client.get_all.return_value = [mock_doc2, mock_doc1]
         
-        mock_doc1 = MagicMock()
-        mock_doc1.exists = True
-        mock_doc1.to_dict.return_value = {
-            "id": "asset1",
-            "blob_path": "users/user123/images/asset1.png",
-            "asset_type": "image",
-            "mime_type": "image/png"
-        }
-        
-        mock_doc2 = MagicMock()
-        mock_doc2.exists = True
-        mock_doc2.to_dict.return_value = {
-            "id": "asset2",
-            "blob_path": "users/user123/images/asset2.png",
-            "asset_type": "image",
-            "mime_type": "image/png"
-        }
-        
-        def mock_get(asset_id):
-            if asset_id == "asset1":
-                doc_ref = MagicMock()
-                doc_ref.get.return_value = mock_doc1
-                return doc_ref
-            elif asset_id == "asset2":
-                doc_ref = MagicMock()
-                doc_ref.get.return_value = mock_doc2
-                return doc_ref
-        
-        mock_firestore_client.collection.return_value.document = mock_get
-        
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
         result = await service.resolve_asset_urls(["asset1", "asset2"])
         
+        mock_firestore_client.get_all.assert_called_once()
         assert len(result) == 2
         assert "asset1" in result
         assert "asset2" in result
@@ -429,20 +573,17 @@ class TestLibraryServiceFirestoreURLResolution:
         assert result["asset1"]["url"] is not None
         assert "genmediastudio-assets" in result["asset1"]["url"]
     
-    async def test_resolve_asset_urls_missing_assets(self, mock_firestore_client, mock_gcs):
+    async def test_resolve_asset_urls_missing_assets(self, mock_firestore_client, fake_gcs):
         """Test handling missing assets in batch"""
-        from app.services.library_firestore import LibraryServiceFirestore
+        missing = []
+        for asset_id in ("missing1", "missing2"):
+            mock_doc = Mock(spec=DocumentSnapshot)
+            mock_doc.id = asset_id
+            mock_doc.exists = False
+            missing.append(mock_doc)
+        mock_firestore_client.get_all.return_value = missing
         
-        mock_storage, _, _ = mock_gcs
-        
-        mock_doc = MagicMock()
-        mock_doc.exists = False
-        
-        mock_doc_ref = MagicMock()
-        mock_doc_ref.get.return_value = mock_doc
-        mock_firestore_client.collection.return_value.document.return_value = mock_doc_ref
-        
-        service = LibraryServiceFirestore(gcs_client=mock_storage)
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
         
         result = await service.resolve_asset_urls(["missing1", "missing2"])
         
@@ -450,3 +591,34 @@ class TestLibraryServiceFirestoreURLResolution:
         assert len(result) == 2
         assert result["missing1"]["exists"] == False
         assert result["missing1"]["url"] is None
+    
+    async def test_resolve_asset_urls_batch_read_failure(self, mock_firestore_client, fake_gcs):
+        """Test a failed batch read marks every asset as missing"""
+        mock_firestore_client.get_all.side_effect = Exception("Firestore unavailable")
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        result = await service.resolve_asset_urls(["asset1", "asset2"])
+        
+        assert result == {
+            "asset1": {"url": None, "exists": False},
+            "asset2": {"url": None, "exists": False}
+        }
+    
+    async def test_resolve_asset_urls_invalid_id(self, mock_firestore_client, fake_gcs):
+        """Test an invalid document id is reported missing without failing the batch"""
+        mock_firestore_client.get_all.return_value = [_snapshot("asset1")]
+        
+        def document(asset_id):
+            if "/" in asset_id:
+                raise ValueError("A document must have an even number of path elements")
+            return Mock(spec=DocumentReference)
+        mock_firestore_client.collection.return_value.document.side_effect = document
+        
+        service = LibraryServiceFirestore(gcs_client=fake_gcs)
+        
+        result = await service.resolve_asset_urls(["asset1", "a/b"])
+        
+        assert len(mock_firestore_client.get_all.call_args.args[0]) == 1
+        assert result["asset1"]["exists"] == True
+        assert result["a/b"] == {"url": None, "exists": False}
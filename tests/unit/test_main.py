@@ -1,3 +1,4 @@
+from fastapi.responses import ORJSONResponse
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -19,6 +20,12 @@ def test_health_endpoint():
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
+def test_responses_use_orjson():
+    """JSON responses are rendered with orjson"""
+    response = client.get("/")
+    assert response.headers["content-type"] == "application/json"
+    assert app.router.default_response_class is ORJSONResponse
+
 def test_cors_headers():
     """CORS headers are present"""
     response = client.options(
@@ -1,216 +1,92 @@
 """Test error handling in routers"""
 import pytest
-from unittest.mock import AsyncMock, MagicMock
+from types import SimpleNamespace
 from fastapi import HTTPException
 from app.routers.generation import generate_image, generate_video, generate_text, check_video_status, upscale_image
-from app.routers.library import save_asset, list_assets, get_asset, delete_asset
+from app.routers.library import save_asset, list_assets, get_asset, delete_asset, finalize_upload
+from app.services.library_firestore import UploadNotFoundError
 from app.schemas import (
     ImageRequest, VideoRequest, TextRequest, StatusRequest, UpscaleRequest,
     SaveAssetRequest
 )
 
+_USER = {"uid": "user-123", "email": "test@test.com"}
 
-class TestGenerationRouterErrors:
-    @pytest.mark.asyncio
-    async def test_generate_image_error(self):
-        """Image generation error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.generate_image.side_effect = Exception("API Error")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        request = ImageRequest(prompt="test")
-        
-        with pytest.raises(HTTPException) as exc:
-            await generate_image(request, user, mock_service)
-        
-        assert exc.value.status_code == 500
-        assert "API Error" in exc.value.detail
+# Request models are validated once at import and shared by every test
+_IMAGE_REQ = ImageRequest(prompt="test")
+_VIDEO_REQ = VideoRequest(prompt="test video")
+_STATUS_REQ = StatusRequest(operation_name="operations/123")
+_UPSCALE_REQ = UpscaleRequest(image="base64data")
+_TEXT_REQ = TextRequest(prompt="test text")
+_SAVE_INVALID_REQ = SaveAssetRequest(data="base64", asset_type="invalid")
+_SAVE_IMAGE_REQ = SaveAssetRequest(data="base64", asset_type="image")
 
-    @pytest.mark.asyncio
-    async def test_generate_video_error(self):
-        """Video generation error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.generate_video.side_effect = Exception("Video API Error")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        request = VideoRequest(prompt="test video")
-        
-        with pytest.raises(HTTPException) as exc:
-            await generate_video(request, user, mock_service)
-        
-        assert exc.value.status_code == 500
-        assert "Video API Error" in exc.value.detail
 
-    @pytest.mark.asyncio
-    async def test_generate_text_error(self):
-        """Text generation error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.generate_text.side_effect = Exception("Text API Error")
-        
-        request = TextRequest(prompt="test text")
-        
-        with pytest.raises(HTTPException) as exc:
-            await generate_text(request, mock_service)
-        
-        assert exc.value.status_code == 500
-        assert "Text API Error" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_check_video_status_error(self):
-        """Video status check error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.check_video_status.side_effect = Exception("Status check failed")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        request = StatusRequest(operation_name="operations/123")
+class TestGenerationRouterErrors:
+    @pytest.mark.parametrize("endpoint,request_model,method_name,error", [
+        (generate_image, _IMAGE_REQ, "generate_image", "API Error"),
+        (generate_video, _VIDEO_REQ, "generate_video", "Video API Error"),
+        (check_video_status, _STATUS_REQ, "check_video_status", "Status check failed"),
+        (upscale_image, _UPSCALE_REQ, "upscale_image", "Upscale failed"),
+    ], ids=["image", "video", "video_status", "upscale"])
+    async def test_generation_error(self, async_stub, endpoint, request_model, method_name, error):
+        """Authenticated generation errors return 500"""
+        service = SimpleNamespace(**{method_name: async_stub(exc=Exception(error))})
         
         with pytest.raises(HTTPException) as exc:
-            await check_video_status(request, user, mock_service)
+            await endpoint(request_model, _USER, service)
         
         assert exc.value.status_code == 500
-        assert "Status check failed" in exc.value.detail
+        assert exc.value.detail == error
 
-    @pytest.mark.asyncio
-    async def test_upscale_image_error(self):
-        """Image upscale error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.upscale_image.side_effect = Exception("Upscale failed")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        request = UpscaleRequest(image="base64data")
+    async def test_generate_text_error(self, async_stub):
+        """Text generation error returns 500"""
+        service = SimpleNamespace(generate_text=async_stub(exc=Exception("Text API Error")))
         
         with pytest.raises(HTTPException) as exc:
-            await upscale_image(request, user, mock_service)
+            await generate_text(_TEXT_REQ, service)
         
         assert exc.value.status_code == 500
-        assert "Upscale failed" in exc.value.detail
+        assert exc.value.detail == "Text API Error"
 
 
 class TestLibraryRouterErrors:
-    @pytest.mark.asyncio
-    async def test_save_asset_value_error(self):
-        """Save asset with invalid type returns 400"""
-        mock_service = AsyncMock()
-        mock_service.save_asset.side_effect = ValueError("Invalid asset type")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        request = SaveAssetRequest(data="base64", asset_type="invalid")
-        
-        with pytest.raises(HTTPException) as exc:
-            await save_asset(request, user, mock_service)
-        
-        assert exc.value.status_code == 400
-        assert "Invalid asset type" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_save_asset_general_error(self):
-        """Save asset general error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.save_asset.side_effect = Exception("Storage error")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        request = SaveAssetRequest(data="base64", asset_type="image")
+    @pytest.mark.parametrize("endpoint,args,method_name,error,status_code", [
+        (save_asset, (_SAVE_INVALID_REQ,), "save_asset", ValueError("Invalid asset type"), 400),
+        (save_asset, (_SAVE_IMAGE_REQ,), "save_asset", Exception("Storage error"), 500),
+        (list_assets, (None, 50), "list_assets", Exception("List failed"), 500),
+        (get_asset, ("asset-123",), "get_asset", ValueError("Asset not found"), 404),
+        (get_asset, ("asset-456",), "get_asset", PermissionError("Access denied"), 403),
+        (get_asset, ("asset-789",), "get_asset", Exception("Database error"), 500),
+        (delete_asset, ("asset-123",), "delete_asset", ValueError("Asset not found"), 404),
+        (delete_asset, ("asset-456",), "delete_asset", PermissionError("Not your asset"), 403),
+        (delete_asset, ("asset-789",), "delete_asset", Exception("Delete failed"), 500),
+        (finalize_upload, ("asset-123",), "finalize_upload", UploadNotFoundError("Upload not found"), 404),
+        (finalize_upload, ("asset-123",), "finalize_upload", KeyError("expires_at"), 500),
+        (finalize_upload, ("asset-123",), "finalize_upload", ValueError("Upload has not completed"), 400),
+        (finalize_upload, ("asset-123",), "finalize_upload", ValueError("Upload expired"), 400),
+    ], ids=[
+        "save_invalid", "save_error", "list_error",
+        "get_not_found", "get_forbidden", "get_error",
+        "delete_not_found", "delete_forbidden", "delete_error",
+        "finalize_not_found", "finalize_malformed", "finalize_incomplete", "finalize_expired",
+    ])
+    async def test_library_error(self, async_stub, endpoint, args, method_name, error, status_code):
+        """Service errors map to the router's HTTP status codes"""
+        service = SimpleNamespace(**{method_name: async_stub(exc=error)})
         
         with pytest.raises(HTTPException) as exc:
-            await save_asset(request, user, mock_service)
+            await endpoint(*args, _USER, service)
         
-        assert exc.value.status_code == 500
-        assert "Storage error" in exc.value.detail
+        assert exc.value.status_code == status_code
+        assert exc.value.detail == str(error)
 
-    @pytest.mark.asyncio
-    async def test_list_assets_error(self):
-        """List assets error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.list_assets.side_effect = Exception("List failed")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
+    async def test_list_assets_invalid_page_token(self, async_stub):
+        """Invalid page token returns 400"""
+        service = SimpleNamespace(list_assets=async_stub(exc=ValueError("Invalid page token")))
         
         with pytest.raises(HTTPException) as exc:
-            await list_assets(None, 50, user, mock_service)
+            await list_assets(None, 50, _USER, service, "bogus")
         
-        assert exc.value.status_code == 500
-        assert "List failed" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_get_asset_not_found(self):
-        """Get asset not found returns 404"""
-        mock_service = AsyncMock()
-        mock_service.get_asset.side_effect = ValueError("Asset not found")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        
-        with pytest.raises(HTTPException) as exc:
-            await get_asset("asset-123", user, mock_service)
-        
-        assert exc.value.status_code == 404
-        assert "Asset not found" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_get_asset_permission_denied(self):
-        """Get asset permission denied returns 403"""
-        mock_service = AsyncMock()
-        mock_service.get_asset.side_effect = PermissionError("Access denied")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        
-        with pytest.raises(HTTPException) as exc:
-            await get_asset("asset-456", user, mock_service)
-        
-        assert exc.value.status_code == 403
-        assert "Access denied" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_get_asset_general_error(self):
-        """Get asset general error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.get_asset.side_effect = Exception("Database error")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        
-        with pytest.raises(HTTPException) as exc:
-            await get_asset("asset-789", user, mock_service)
-        
-        assert exc.value.status_code == 500
-        assert "Database error" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_delete_asset_not_found(self):
-        """Delete asset not found returns 404"""
-        mock_service = AsyncMock()
-        mock_service.delete_asset.side_effect = ValueError("Asset not found")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        
-        with pytest.raises(HTTPException) as exc:
-            await delete_asset("asset-123", user, mock_service)
-        
-        assert exc.value.status_code == 404
-        assert "Asset not found" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_delete_asset_permission_denied(self):
-        """Delete asset permission denied returns 403"""
-        mock_service = AsyncMock()
-        mock_service.delete_asset.side_effect = PermissionError("Not your asset")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        
-        with pytest.raises(HTTPException) as exc:
-            await delete_asset("asset-456", user, mock_service)
-        
-        assert exc.value.status_code == 403
-        assert "Not your asset" in exc.value.detail
-
-    @pytest.mark.asyncio
-    async def test_delete_asset_general_error(self):
-        """Delete asset general error returns 500"""
-        mock_service = AsyncMock()
-        mock_service.delete_asset.side_effect = Exception("Delete failed")
-        
-        user = {"uid": "user-123", "email": "test@test.com"}
-        
-        with pytest.raises(HTTPException) as exc:
-            await delete_asset("asset-789", user, mock_service)
-        
-        assert exc.value.status_code == 500
-        assert "Delete failed" in exc.value.detail
+        assert exc.value.status_code == 400
+        assert exc.value.detail == "Invalid page token"
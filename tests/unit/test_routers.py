@@ -1,64 +1,94 @@
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
-from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from unittest.mock import patch
+from httpx import ASGITransport, AsyncClient
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.routers import generation, library, health
-from app.schemas import ImageResponse, LibraryResponse, AssetResponse
+from app.schemas import ImageResponse, LibraryResponse, AssetResponse, TextResponse
 
 # Create test app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.include_router(health.router, prefix="")
 app.include_router(generation.router, prefix="/generate")
 app.include_router(library.router, prefix="/library")
 
-client = TestClient(app)
+# Paths resolved from route names once, so tests follow prefix/path changes
+IMAGE_PATH = app.url_path_for("generate_image")
+VIDEO_PATH = app.url_path_for("generate_video")
+TEXT_PATH = app.url_path_for("generate_text")
+LIBRARY_PATH = app.url_path_for("list_assets")
+SAVE_ASSET_PATH = app.url_path_for("save_asset")
+DELETE_ASSET_PATH = app.url_path_for("delete_asset", asset_id="asset-123")
+
+# Service responses validated once at import and returned by the stubs
+_TEXT_RESP = TextResponse(response="Hello!")
+_IMAGE_RESP = ImageResponse(images=["base64data"])
+_EMPTY_LIB = LibraryResponse(assets=[], count=0)
+_SAMPLE_ASSET = AssetResponse(
+    id="asset-123",
+    url="https://storage.example.com/image.png",
+    asset_type="image",
+    prompt="test",
+    created_at="2024-01-01T00:00:00Z",
+    mime_type="image/png",
+    user_id="user-123"
+)
+
+@pytest.fixture
+async def client():
+    """Async client calling the app in-process on the test's event loop"""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+@pytest.fixture
+def override(monkeypatch):
+    """Set app.dependency_overrides entries that are undone after the test, even on failure"""
+    def _override(dependency, provider):
+        monkeypatch.setitem(app.dependency_overrides, dependency, provider)
+    return _override
 
 class TestHealthRouter:
     def test_health_check(self):
-        """Health endpoint returns status"""
-        response = client.get("/")
-        assert response.status_code == 200
-        assert response.json()["status"] == "ok"
+        """Health handler returns status; routing is covered in test_main.py"""
+        assert health.health()["status"] == "ok"
 
-class TestGenerationRouter:
-    def test_generate_image_requires_auth(self):
-        """Image generation requires authentication"""
-        response = client.post("/generate/image", json={"prompt": "test"})
-        assert response.status_code == 401
-
-    def test_generate_video_requires_auth(self):
-        """Video generation requires authentication"""
-        response = client.post("/generate/video", json={"prompt": "test"})
+class TestRequiresAuth:
+    @pytest.mark.parametrize("method,path,body", [
+        ("POST", IMAGE_PATH, {"prompt": "test"}),
+        ("POST", VIDEO_PATH, {"prompt": "test"}),
+        ("GET", LIBRARY_PATH, None),
+        ("DELETE", DELETE_ASSET_PATH, None),
+    ])
+    async def test_requires_auth(self, client, method, path, body):
+        """Protected endpoints reject requests without a token"""
+        response = await client.request(method, path, json=body)
         assert response.status_code == 401
 
-    def test_generate_text_no_auth_required(self):
+class TestGenerationRouter:
+    async def test_generate_text_no_auth_required(self, client, async_stub, override):
         """Text generation doesn't require auth (based on current implementation)"""
         from app.routers.generation import get_generation_service
-        from app.schemas import TextResponse
         
-        mock_service = AsyncMock()
-        mock_service.generate_text.return_value = TextResponse(response="Hello!")
-        app.dependency_overrides[get_generation_service] = lambda: mock_service
+        mock_service = SimpleNamespace(generate_text=async_stub(_TEXT_RESP))
+        override(get_generation_service, lambda: mock_service)
         
-        response = client.post("/generate/text", json={"prompt": "say hi"})
+        response = await client.post(TEXT_PATH, json={"prompt": "say hi"})
         
         assert response.status_code == 200
         assert response.json()["response"] == "Hello!"
-        
-        app.dependency_overrides.clear()
 
     @patch("app.routers.generation.get_current_user")
     @patch("app.routers.generation.get_generation_service")
-    def test_generate_image_success(self, mock_get_service, mock_get_user):
+    async def test_generate_image_success(self, mock_get_service, mock_get_user, client, async_stub):
         """Successful image generation"""
         mock_get_user.return_value = {"uid": "user-123", "email": "test@test.com"}
         
-        mock_service = AsyncMock()
-        mock_service.generate_image.return_value = ImageResponse(images=["base64data"])
+        mock_service = SimpleNamespace(generate_image=async_stub(_IMAGE_RESP))
         mock_get_service.return_value = mock_service
         
-        response = client.post(
-            "/generate/image",
+        response = await client.post(
+            IMAGE_PATH,
             json={"prompt": "a puppy"},
             headers={"Authorization": "Bearer fake-token"}
         )
@@ -67,67 +97,41 @@ class TestGenerationRouter:
         # Full integration test would use dependency_overrides
         assert response.status_code in [200, 401]
 
-class TestLibraryRouter:
-    def test_list_assets_requires_auth(self):
-        """Library listing requires authentication"""
-        response = client.get("/library")
-        assert response.status_code == 401
-
-    def test_delete_asset_requires_auth(self):
-        """Asset deletion requires authentication"""
-        response = client.delete("/library/asset-123")
-        assert response.status_code == 401
-
 
 class TestRouterIntegration:
     """Integration tests using dependency overrides"""
     
-    def test_list_assets_with_override(self):
+    async def test_list_assets_with_override(self, client, async_stub, override):
         """Test with dependency override"""
         from app.auth import get_current_user
         from app.routers.library import get_library_service
         
         # Override dependencies
-        app.dependency_overrides[get_current_user] = lambda: {"uid": "user-123", "email": "test@test.com"}
+        override(get_current_user, lambda: {"uid": "user-123", "email": "test@test.com"})
         
-        mock_service = AsyncMock()
-        mock_service.list_assets.return_value = LibraryResponse(assets=[], count=0)
-        app.dependency_overrides[get_library_service] = lambda: mock_service
+        mock_service = SimpleNamespace(list_assets=async_stub(_EMPTY_LIB))
+        override(get_library_service, lambda: mock_service)
         
-        response = client.get("/library")
+        response = await client.get(LIBRARY_PATH)
         
         assert response.status_code == 200
         assert response.json()["count"] == 0
-        
-        # Clean up
-        app.dependency_overrides.clear()
 
-    def test_save_asset_with_override(self):
+    async def test_save_asset_with_override(self, client, async_stub, override):
         """Test save with dependency override"""
         from app.auth import get_current_user
         from app.routers.library import get_library_service
         
-        app.dependency_overrides[get_current_user] = lambda: {"uid": "user-123", "email": "test@test.com"}
+        override(get_current_user, lambda: {"uid": "user-123", "email": "test@test.com"})
         
-        mock_service = AsyncMock()
-        mock_service.save_asset.return_value = AssetResponse(
-            id="asset-123",
-            url="https://storage.example.com/image.png",
-            asset_type="image",
-            prompt="test",
-            created_at="2024-01-01T00:00:00Z",
-            mime_type="image/png",
-            user_id="user-123"
-        )
-        app.dependency_overrides[get_library_service] = lambda: mock_service
+        mock_service = SimpleNamespace(save_asset=async_stub(_SAMPLE_ASSET))
+        override(get_library_service, lambda: mock_service)
         
-        response = client.post("/library/save", json={
+        response = await client.post(SAVE_ASSET_PATH, json={
             "data": "base64data",
             "asset_type": "image",
             "prompt": "test"
         })
         
         assert response.status_code == 200
-        assert response.json()["id"] == "asset-123"
-        
-        app.dependency_overrides.clear()
\ No newline at end of file
+        assert response.json()["id"] == "asset-123"
\ No newline at end of file
@@ -5,11 +5,13 @@ import pytest
 from unittest.mock import AsyncMock, patch, MagicMock, Mock
 from fastapi.testclient import TestClient
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from app.routers import workflow
 from app.schemas import WorkflowIdResponse, WorkflowMessageResponse
+from app.services.workflow_firestore import WorkflowServiceFirestore
 
 # Create test app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.include_router(workflow.router, prefix="/workflows")
 
 client = TestClient(app)
@@ -21,7 +23,6 @@ class TestWorkflowServiceFactory:
     def test_get_workflow_service_returns_instance(self):
         """Verify get_workflow_service returns a WorkflowServiceFirestore instance"""
         from app.routers.workflow import get_workflow_service
-        from app.services.workflow_firestore import WorkflowServiceFirestore
         
         with patch('app.services.workflow_firestore.get_firestore_client') as mock_fs:
             mock_fs.return_value.collection.return_value = Mock()
@@ -37,8 +38,8 @@ def mock_user():
 
 @pytest.fixture
 def mock_workflow_service():
-    """Mock workflow service"""
-    return AsyncMock()
+    """Mock workflow service; spec rejects calls to methods the service doesn't have"""
+    return AsyncMock(spec=WorkflowServiceFirestore)
 
 
 @pytest.fixture
@@ -122,7 +123,7 @@ class TestSaveWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.create_workflow.return_value = "wf_new_123"
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -142,7 +143,7 @@ class TestSaveWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.create_workflow.side_effect = HTTPException(
             status_code=400, detail="Workflow name is required"
         )
@@ -162,7 +163,7 @@ class TestSaveWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.create_workflow.side_effect = Exception("GCS connection failed")
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -184,7 +185,7 @@ class TestListWorkflows:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.list_workflows.return_value = [sample_workflow]
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -222,7 +223,7 @@ class TestListWorkflows:
             }
         ]
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.list_workflows.return_value = workflows
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -243,7 +244,7 @@ class TestListWorkflows:
         public_workflow = sample_workflow.copy()
         public_workflow["is_public"] = True
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.list_workflows.return_value = [public_workflow]
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -263,7 +264,7 @@ class TestListWorkflows:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.list_workflows.return_value = []
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -281,7 +282,7 @@ class TestListWorkflows:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.list_workflows.side_effect = Exception("GCS error")
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -303,7 +304,7 @@ class TestGetWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.get_workflow.return_value = sample_workflow
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -326,7 +327,7 @@ class TestGetWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.get_workflow.side_effect = HTTPException(
             status_code=404, detail="Workflow not found"
         )
@@ -345,7 +346,7 @@ class TestGetWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.get_workflow.side_effect = HTTPException(
             status_code=403, detail="Access denied"
         )
@@ -364,7 +365,7 @@ class TestGetWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.get_workflow.side_effect = Exception("GCS read failed")
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -386,7 +387,7 @@ class TestUpdateWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.update_workflow.return_value = None
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -406,7 +407,7 @@ class TestUpdateWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.update_workflow.side_effect = HTTPException(
             status_code=404, detail="Workflow not found"
         )
@@ -425,7 +426,7 @@ class TestUpdateWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.update_workflow.side_effect = HTTPException(
             status_code=403, detail="Only the owner can update this workflow"
         )
@@ -444,7 +445,7 @@ class TestUpdateWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.update_workflow.side_effect = Exception("GCS write failed")
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -466,7 +467,7 @@ class TestDeleteWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.delete_workflow.return_value = None
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -488,7 +489,7 @@ class TestDeleteWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.delete_workflow.side_effect = HTTPException(
             status_code=404, detail="Workflow not found"
         )
@@ -507,7 +508,7 @@ class TestDeleteWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.delete_workflow.side_effect = HTTPException(
             status_code=403, detail="Only the owner can delete this workflow"
         )
@@ -526,7 +527,7 @@ class TestDeleteWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.delete_workflow.side_effect = Exception("GCS delete failed")
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -548,7 +549,7 @@ class TestCloneWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.clone_workflow.return_value = "wf_cloned_123"
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -572,7 +573,7 @@ class TestCloneWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.clone_workflow.side_effect = HTTPException(
             status_code=404, detail="Workflow not found"
         )
@@ -591,7 +592,7 @@ class TestCloneWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.clone_workflow.side_effect = HTTPException(
             status_code=403, detail="Cannot clone private workflow"
         )
@@ -610,7 +611,7 @@ class TestCloneWorkflow:
         from app.auth import get_current_user
         from app.routers.workflow import get_workflow_service
         
-        mock_service = AsyncMock()
+        mock_service = AsyncMock(spec=WorkflowServiceFirestore)
         mock_service.clone_workflow.side_effect = Exception("GCS write failed")
         
         app.dependency_overrides[get_current_user] = lambda: mock_user
@@ -391,22 +391,18 @@ class TestWorkflowServiceFirestoreURLResolution:
     """Test asset URL resolution"""
     
     async def test_resolve_asset_urls_with_refs(self, mock_firestore_client):
-        """Test resolving asset references in nodes"""
+        """Test resolving asset references in nodes with one batched read"""
         from app.services.workflow_firestore import WorkflowServiceFirestore
         
         # Mock asset lookup
         mock_asset_doc = MagicMock()
+        mock_asset_doc.id = "asset1"
         mock_asset_doc.exists = True
         mock_asset_doc.to_dict.return_value = {
             "id": "asset1",
             "blob_path": "users/user123/images/asset1.png"
         }
-        
-        mock_asset_ref = MagicMock()
-        mock_asset_ref.get.return_value = mock_asset_doc
-        
-        mock_collection = mock_firestore_client.collection.return_value
-        mock_collection.document.return_value = mock_asset_ref
+        mock_firestore_client.get_all.return_value = [mock_asset_doc]
         
         service = WorkflowServiceFirestore()
         
@@ -415,13 +411,21 @@ class TestWorkflowServiceFirestoreURLResolution:
                 "id": "1",
                 "type": "image",
                 "data": {"imageRef": "asset1", "prompt": "test"}
+            },
+            {
+                "id": "2",
+                "type": "video",
+                "data": {"outputs": {"videoRef": "asset1"}}
             }
         ]
         
         resolved = service._resolve_asset_urls(nodes)
         
+        mock_firestore_client.get_all.assert_called_once()
+        mock_firestore_client.collection.return_value.document.return_value.get.assert_not_called()
         assert "imageUrl" in resolved[0]["data"]
         assert "genmediastudio-assets" in resolved[0]["data"]["imageUrl"]
+        assert resolved[1]["data"]["outputs"]["videoUrl"] == resolved[0]["data"]["imageUrl"]
     
     async def test_resolve_asset_urls_missing_asset(self, mock_firestore_client):
         """Test handling missing assets gracefully"""
@@ -429,13 +433,9 @@ class TestWorkflowServiceFirestoreURLResolution:
         
         # Mock asset not found
         mock_asset_doc = MagicMock()
+        mock_asset_doc.id = "missing-asset"
         mock_asset_doc.exists = False
-        
-        mock_asset_ref = MagicMock()
-        mock_asset_ref.get.return_value = mock_asset_doc
-        
-        mock_collection = mock_firestore_client.collection.return_value
-        mock_collection.document.return_value = mock_asset_ref
+        mock_firestore_client.get_all.return_value = [mock_asset_doc]
         
         service = WorkflowServiceFirestore()
         
@@ -453,3 +453,46 @@ class TestWorkflowServiceFirestoreURLResolution:
         # Missing asset should have imageUrl: None and imageRefExists: False
         assert resolved[0]["data"]["imageUrl"] is None
         assert resolved[0]["data"]["imageRefExists"] == False
+    
+    async def test_resolve_asset_urls_invalid_ref(self, mock_firestore_client):
+        """Test an invalid document id is reported missing without failing the batch"""
+        from app.services.workflow_firestore import WorkflowServiceFirestore
+        
+        mock_asset_doc = MagicMock()
+        mock_asset_doc.id = "asset1"
+        mock_asset_doc.exists = True
+        mock_asset_doc.to_dict.return_value = {"blob_path": "users/user123/images/asset1.png"}
+        mock_firestore_client.get_all.return_value = [mock_asset_doc]
+        
+        def document(ref):
+            if "/" in ref:
+                raise ValueError("A document must have an even number of path elements")
+            return MagicMock()
+        mock_firestore_client.collection.return_value.document.side_effect = document
+        
+        service = WorkflowServiceFirestore()
+        
+        nodes = [
+            {"id": "1", "type": "image", "data": {"imageRef": "asset1"}},
+            {"id": "2", "type": "image", "data": {"imageRef": "a/b"}}
+        ]
+        
+        resolved = service._resolve_asset_urls(nodes)
+        
+        assert len(mock_firestore_client.get_all.call_args.args[0]) == 1
+        assert resolved[0]["data"]["imageRefExists"] == True
+        assert resolved[1]["data"]["imageUrl"] is None
+        assert resolved[1]["data"]["imageRefExists"] == False
+    
+    async def test_resolve_asset_urls_batch_read_failure(self, mock_firestore_client):
+        """Test a failed batch read marks every ref as missing"""
+        from app.services.workflow_firestore import WorkflowServiceFirestore
+        
+        mock_firestore_client.get_all.side_effect = Exception("Firestore unavailable")
+        
+        service = WorkflowServiceFirestore()
+        
+        resolved = service._resolve_asset_urls([{"id": "1", "data": {"imageRef": "asset1"}}])
+        
+        assert resolved[0]["data"]["imageUrl"] is None
+        assert resolved[0]["data"]["imageRefExists"] == False
\ No newline at end of file